@@ -0,0 +1,86 @@
+"""
+ActionIndex sorts every action into buckets in a single pass, so the
+organizer scripts can look up all the actions for a project ('pulse'), group,
+event type or date directly. They used to find each pulse's actions by
+rescanning the whole list of actions once per pulse id, which gets very slow
+once several years of activity logs are merged.
+"""
+
+# Python built-in modules
+from collections import defaultdict
+
+
+class ActionIndex:
+    """
+    Index of action dicts built in one pass over the list of actions.
+    Actions are bucketed by pulse_id (in the order each pulse first shows up),
+    with secondary indexes by group_id, event type and event_date. Actions
+    without a pulse_id, like renaming a board, are left out, the same as
+    check_for_pulses does.
+    """
+
+    def __init__(self, actions=(), pulse_key='pulse_id', group_key='group_id',
+                 event_key='event', date_key='event_date'):
+        self.pulse_key = pulse_key
+        self.group_key = group_key
+        self.event_key = event_key
+        self.date_key = date_key
+        self.by_pulse = {} # pulse_id: list of actions, keeps first-seen order of pulses
+        self.by_group = defaultdict(list)
+        self.by_event = defaultdict(list)
+        self.by_date = defaultdict(list)
+        self.total_actions = 0
+        for action in actions:
+            self.add(action)
+
+    def add(self, action):
+        """
+        Add a single action to every index it belongs in.
+        """
+        pulse_id = action.get(self.pulse_key)
+        if pulse_id is None: # Not a project action
+            return
+        project_actions = self.by_pulse.get(pulse_id)
+        if project_actions is None:
+            project_actions = self.by_pulse[pulse_id] = []
+        project_actions.append(action)
+        if self.group_key in action:
+            self.by_group[action[self.group_key]].append(action)
+        if self.event_key in action:
+            self.by_event[action[self.event_key]].append(action)
+        if self.date_key in action:
+            self.by_date[action[self.date_key]].append(action)
+        self.total_actions += 1
+
+    def pulse_ids(self):
+        """
+        List of unique pulse ids, in the order they first appear.
+        """
+        return list(self.by_pulse)
+
+    def actions_for_pulse(self, pulse_id):
+        return self.by_pulse.get(pulse_id, [])
+
+    def actions_for_group(self, group_id):
+        return self.by_group.get(group_id, [])
+
+    def actions_for_event(self, event):
+        return self.by_event.get(event, [])
+
+    def actions_on_date(self, event_date):
+        return self.by_date.get(event_date, [])
+
+    def projects(self, pulse_ids=None):
+        """
+        List of lists of action dicts, one list per project, in the same shape
+        gather_dicts_by_pulse has always returned.
+        """
+        if pulse_ids is None:
+            return list(self.by_pulse.values())
+        return [self.actions_for_pulse(pulse_id) for pulse_id in pulse_ids]
+
+    def __len__(self):
+        return self.total_actions
+
+    def __contains__(self, pulse_id):
+        return pulse_id in self.by_pulse
@@ -0,0 +1,84 @@
+"""
+Action holds the fields of one action, once the keys we keep are picked out
+and renamed, in fixed slots, and shares one copy of the strings repeated across
+thousands of actions, like the event type, column name and group id. Each
+action used to be its own dict, carrying its own hash table of key names and
+its own copies of those strings. Action reads like the dict it replaces
+(action['pulse_id'], 'new_date' in action, action.get(), .keys(), .values(),
+.items()), so the organizer scripts work the same with either.
+"""
+
+# Python built-in modules
+from collections.abc import Mapping
+from sys import intern
+
+# Every renamed key from organize_create_projects.map_keys(), plus group_name
+ACTION_FIELDS = (
+    'action_id', 'event', 'item_type', 'user_id', 'event_date', 'board_id', 'group_id', 'pulse_id', 'pulse_name',
+    'column_id', 'column_name', 'new_date', 'prior_value', 'item_id', 'item_name', 'new_text', 'date_last_changed',
+    'prior_text', 'value_text', 'is_done', 'group_name', 'prior_value_text', 'prior_value_date', 'value_name',
+    'prior_value_name', 'source_board_id', 'source_board_name', 'destination_board_id', 'destination_board_name',
+    'source_group_id', 'source_group_title', 'destination_group_id', 'destination_group_title', 'group_title',
+    'source_pulse_id', 'destination_pulse_id',
+    )
+# Fields with only a handful of distinct values, so one shared copy of each string is kept
+INTERNED_FIELDS = frozenset([
+    'event', 'item_type', 'user_id', 'group_id', 'group_name', 'column_id', 'column_name', 'group_title',
+    'source_group_id', 'source_group_title', 'destination_group_id', 'destination_group_title',
+    'source_board_name', 'destination_board_name',
+    ])
+_MISSING = object()
+
+
+class Action(Mapping):
+    """
+    One action with its renamed keys as slots. A field the action doesn't have
+    is simply left unset, so it's missing the same way a key missing from the
+    dict would be.
+    """
+
+    __slots__ = ACTION_FIELDS
+
+    def __init__(self, fields=(), **kwargs):
+        for key, value in dict(fields, **kwargs).items():
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = intern(value)
+            setattr(self, key, value) # AttributeError for a key that isn't one of ACTION_FIELDS
+
+    def __getitem__(self, key):
+        value = getattr(self, key, _MISSING) if key in _FIELD_SET else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        if key not in _FIELD_SET:
+            return default
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET and hasattr(self, key)
+
+    def __iter__(self):
+        for key in ACTION_FIELDS:
+            if hasattr(self, key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def __repr__(self):
+        return f'Action({dict(self.items())!r})'
+
+    def __reduce__(self):
+        # Pickle as the dict of set fields, e.g. to pass actions between worker processes
+        return (Action, (dict(self.items()),))
+
+_FIELD_SET = frozenset(ACTION_FIELDS)
+
+def iter_compact_actions(actions):
+    """
+    Turn a stream of action dicts (with renamed keys) into Actions.
+    """
+    for action in actions:
+        yield Action(action)
@@ -0,0 +1,188 @@
+"""
+Fetches activity logs for many boards and date windows concurrently with
+asyncio, capped by a semaphore so we don't swamp the API. Any window that comes
+back full is split in half and both halves are fetched again, until every
+window fits under the 10000-record limit of a query. Rate-limit and
+complexity-budget responses are retried after backing off.
+query_monday.activity_query pulls one board and one quarter at a time, one
+request after another, and silently cuts off anything past that limit.
+
+The API url is a parameter, so all of this can be pointed at a local stub server.
+"""
+
+# Python built-in modules
+import asyncio
+import datetime
+import random
+import re
+
+# Local modules
+from monday_client import API_URL, QUERY_LIMIT, MondayAPIError, MondayClient, build_activity_query
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+_RETRY_CODES = ('ComplexityException', 'COMPLEXITY_BUDGET_EXHAUSTED', 'RateLimitExceeded', 'RATE_LIMIT_EXCEEDED',
+                'maxConcurrencyExceeded', 'MAX_CONCURRENCY_EXCEEDED')
+_RESET_IN = re.compile(r'reset in (\d+) seconds?')
+
+
+def quarter_windows(year):
+    """
+    The four quarterly (from_date, to_date) windows of a year, as used in query_monday.
+    """
+    return [
+        (f'{year}-01-01T00:00:00Z', f'{year}-03-31T23:59:59Z'),
+        (f'{year}-04-01T00:00:00Z', f'{year}-06-30T23:59:59Z'),
+        (f'{year}-07-01T00:00:00Z', f'{year}-09-30T23:59:59Z'),
+        (f'{year}-10-01T00:00:00Z', f'{year}-12-31T23:59:59Z'),
+        ]
+
+def split_window(from_date, to_date):
+    """
+    Split a date window in half, returning two windows that share the middle
+    second, or None if the window is too short (under two seconds) to split.
+    Dates only go down to the second while created_at is much finer, so
+    anything in the middle second is asked for by both halves; the results
+    are merged by activity id, so it only comes back once.
+    """
+    start = datetime.datetime.strptime(from_date, DATE_FORMAT)
+    end = datetime.datetime.strptime(to_date, DATE_FORMAT)
+    if (end - start).total_seconds() < 2:
+        return None
+    middle = start + (end - start) / 2
+    middle = middle.replace(microsecond=0)
+    left = (from_date, middle.strftime(DATE_FORMAT))
+    right = (middle.strftime(DATE_FORMAT), to_date)
+    return left, right
+
+def _retry_delay(response, result, attempt, base_delay):
+    """
+    How long to wait before retrying a request, or None if it shouldn't be retried.
+    Uses the wait Monday.com asks for when it gives one, otherwise backs off exponentially.
+    """
+    backoff = base_delay * (2 ** attempt) * (1 + random.random()) # Jitter so parallel requests don't retry together
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return _delay_from_result(result) or backoff
+    if result is None:
+        return None
+    if result.get('error_code') in _RETRY_CODES:
+        return _delay_from_result(result) or backoff
+    for error in result.get('errors') or []:
+        if (error.get('extensions') or {}).get('code') in _RETRY_CODES:
+            return _delay_from_result(result) or backoff
+    return None
+
+def _delay_from_result(result):
+    # Monday.com says when the complexity budget resets, either in extensions or in the message
+    if not result:
+        return None
+    for error in result.get('errors') or []:
+        seconds = (error.get('extensions') or {}).get('retry_in_seconds')
+        if seconds is not None:
+            return float(seconds)
+    match = _RESET_IN.search(str(result.get('error_message', '')) + str(result.get('errors', '')))
+    if match:
+        return float(match.group(1))
+    return None
+
+class ActivityFetcher:
+    """
+    Fetches activity logs for many boards and date windows concurrently.
+    At most `concurrency` requests are in flight at once; requests run on
+    worker threads sharing one MondayClient, so connections are pooled.
+    """
+
+    def __init__(self, api_key=None, api_url=API_URL, concurrency=4, limit=QUERY_LIMIT,
+                 max_retries=6, base_delay=1.0, client=None, timeout=120):
+        if client is None:
+            client = MondayClient(api_key, api_url, pool_size=concurrency, timeout=timeout)
+        self.client = client
+        self.concurrency = concurrency
+        self.limit = limit
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.requests_made = 0
+        self.windows_split = 0
+
+    async def _post(self, semaphore, query):
+        # One request, retried with backoff on rate limits and server errors
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                response = await asyncio.to_thread(self.client.post, query)
+                self.requests_made += 1
+            try:
+                result = response.json()
+            except ValueError:
+                result = None
+            delay = _retry_delay(response, result, attempt, self.base_delay)
+            if delay is None:
+                if result is None:
+                    raise MondayAPIError(f'Non-json response ({response.status_code}) from {self.client.api_url}')
+                if 'errors' in result or 'error_code' in result:
+                    raise MondayAPIError('Found an error:\n' + str(result))
+                return result
+            if attempt == self.max_retries:
+                break
+            await asyncio.sleep(delay)
+        raise MondayAPIError(f'Gave up after {self.max_retries + 1} attempts:\n' + str(result))
+
+    async def fetch_window(self, semaphore, board_id, from_date, to_date):
+        """
+        Activity for one board and window. If the window comes back at the query
+        limit, it's split in half and both halves are fetched concurrently.
+        """
+        query = build_activity_query(board_id, from_date, to_date, self.limit)
+        result = await self._post(semaphore, query)
+        boards = result['data']['boards']
+        activities = boards[0]['activity_logs'] if boards else []
+        if len(activities) < self.limit:
+            return activities
+        halves = split_window(from_date, to_date)
+        if halves is None:
+            print(f'Board {board_id}: more than {self.limit} actions at {from_date}, some may be missing.')
+            return activities
+        self.windows_split += 1
+        (left_from, left_to), (right_from, right_to) = halves
+        left, right = await asyncio.gather(
+            self.fetch_window(semaphore, board_id, left_from, left_to),
+            self.fetch_window(semaphore, board_id, right_from, right_to))
+        return _merge_unique(left, right)
+
+    async def fetch_boards(self, board_ids, windows):
+        """
+        Activity for every board over every (from_date, to_date) window,
+        as a dict of board id to a list of activity dicts with no repeats.
+        """
+        return await self.fetch_board_windows({board_id: windows for board_id in board_ids})
+
+    async def fetch_board_windows(self, board_windows):
+        """
+        Like fetch_boards, but each board gets its own list of windows,
+        given as a dict of board id to (from_date, to_date) windows.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        jobs = [(board_id, window) for board_id, windows in board_windows.items() for window in windows]
+        results = await asyncio.gather(*[
+            self.fetch_window(semaphore, board_id, from_date, to_date)
+            for board_id, (from_date, to_date) in jobs])
+        board_activity = {board_id: [] for board_id in board_windows}
+        for (board_id, window), activities in zip(jobs, results):
+            board_activity[board_id] = _merge_unique(board_activity[board_id], activities)
+        return board_activity
+
+def _merge_unique(first, second):
+    # Join two lists of activities, dropping any activity id already seen
+    seen = {activity['id'] for activity in first}
+    return first + [activity for activity in second if activity['id'] not in seen]
+
+def fetch_activity(board_ids, windows, **fetcher_options):
+    """
+    Blocking entry point: fetch activity for the boards over the windows,
+    e.g. fetch_activity([736608574, 623119076], quarter_windows(2023)).
+    Takes the same options as ActivityFetcher.
+    """
+    fetcher = ActivityFetcher(**fetcher_options)
+    return asyncio.run(fetcher.fetch_boards(board_ids, windows))
@@ -0,0 +1,132 @@
+"""
+Typed versions of the activity logs: the envelope of each activity and the
+data level of the events we see most (column changes, and pulses being
+created, archived and moved between groups) as msgspec Structs. msgspec
+decodes json straight into these, checking the types as it goes, and a Struct
+takes a fraction of the memory of a dict with the same fields, since the field
+names aren't stored on every record. Data for any other event is decoded into
+a plain dict, as before.
+
+Needs msgspec, which the organizer scripts don't otherwise use, and imports it
+straight away; import this module inside the code that needs the schemas, so
+importing everything else stays quick.
+"""
+
+# Python built-in modules
+from typing import Any, Optional
+
+try:
+    import msgspec
+    from msgspec import Struct
+except ImportError:
+    raise ImportError("The typed activity schemas need msgspec: pip install msgspec")
+
+# Local modules
+import json_backend
+
+
+class Activity(Struct, gc=False):
+    """
+    One activity from a Monday.com activity log. data stays a json string
+    until typed_data() decodes it.
+    """
+    id: str
+    event: str
+    entity: str
+    created_at: str # Unix time in 1e-7 second units, as a string
+    user_id: Optional[str] = None
+    data: Any = None
+
+class UpdateColumnValue(Struct, omit_defaults=True, gc=False):
+    board_id: int
+    pulse_id: int
+    pulse_name: Optional[str] = None
+    group_id: Optional[str] = None
+    is_top_group: Optional[bool] = None
+    column_id: Optional[str] = None
+    column_type: Optional[str] = None
+    column_title: Optional[str] = None
+    value: Optional[dict] = None
+    previous_value: Optional[dict] = None
+    textual_value: Optional[str] = None
+    previous_textual_value: Optional[str] = None
+    is_column_with_hide_permissions: Optional[bool] = None
+    parent_board_id: Optional[int] = None
+    parent_item_id: Optional[int] = None
+
+class CreatePulse(Struct, omit_defaults=True, gc=False):
+    board_id: int
+    pulse_id: int
+    pulse_name: Optional[str] = None
+    group_id: Optional[str] = None
+    group_name: Optional[str] = None
+    group_color: Optional[str] = None
+    is_top_group: Optional[bool] = None
+    column_values_json: Optional[str] = None
+    parent_board_id: Optional[int] = None
+    parent_item_id: Optional[int] = None
+
+class ArchivePulse(Struct, omit_defaults=True, gc=False):
+    board_id: int
+    pulse_id: int
+    pulse_name: Optional[str] = None
+    value: Optional[dict] = None
+    previous_value: Optional[dict] = None
+    automated_action_data: Optional[dict] = None
+    parent_board_id: Optional[int] = None
+    parent_item_id: Optional[int] = None
+
+class BoardRef(Struct, gc=False):
+    id: int
+    name: Optional[str] = None
+    kind: Optional[str] = None
+
+class GroupRef(Struct, gc=False):
+    id: str
+    title: Optional[str] = None
+    color: Optional[str] = None
+    is_top_group: Optional[bool] = None
+
+class PulseRef(Struct, gc=False):
+    id: int
+    name: Optional[str] = None
+
+class MovePulseIntoGroup(Struct, omit_defaults=True, gc=False):
+    board_id: int
+    pulse: PulseRef
+    group_id: Optional[str] = None
+    source_board: Optional[BoardRef] = None
+    source_group: Optional[GroupRef] = None
+    dest_group: Optional[GroupRef] = None
+    action_record_id: Optional[int] = None
+    is_undo_action: Optional[bool] = None
+    is_batch_action: Optional[bool] = None
+
+# Struct for the data level of each event we have a schema for
+DATA_SCHEMAS = {
+    'update_column_value': UpdateColumnValue,
+    'create_pulse': CreatePulse,
+    'archive_pulse': ArchivePulse,
+    'move_pulse_into_group': MovePulseIntoGroup,
+    }
+_data_decoders = {event: msgspec.json.Decoder(schema) for event, schema in DATA_SCHEMAS.items()}
+
+
+def decode_activity_data(event, text):
+    """
+    Decode the data string of an activity for the given event: into its Struct
+    if there's a schema for the event, otherwise into a dict.
+    """
+    decoder = _data_decoders.get(event)
+    if decoder is None:
+        return json_backend.loads(text)
+    return decoder.decode(text)
+
+def typed_data(activity):
+    """
+    Return the decoded data level of an Activity, decoding it the first
+    time it's asked for and keeping the result on the activity.
+    """
+    if isinstance(activity.data, (str, bytes)):
+        activity.data = decode_activity_data(activity.event, activity.data)
+    return activity.data
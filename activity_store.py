@@ -0,0 +1,240 @@
+"""
+Writes and reads activity in a Parquet store: one directory per board and
+month (board_id=.../month=YYYY-MM/), holding the decoded and typed fields from
+map_keys(). Unlike the pretty-printed json files, which have to be re-read and
+re-written to merge them, new activity is written as new files, so nothing
+already stored is ever rewritten, and a board's full history is just whatever
+files are in its directories, so merging is a matter of listing files. Readers
+can ask for only the columns, boards and months they need, and Parquet skips
+everything else.
+
+Appending is idempotent: an activity whose id is already in its board and
+month is left out, so importing the same file twice, or a sync that stopped
+partway being run again, doesn't store anything twice.
+
+Needs pyarrow, which the organizer scripts don't otherwise use.
+"""
+
+# Python built-in modules
+import datetime
+import os
+import uuid
+from collections import defaultdict
+
+# Local modules
+from activity_stream import activity_data, iter_activities
+from monday_dates import normalize_dates
+from group_names import group_names
+
+pa = ds = pq = None # pyarrow, imported by _require_pyarrow() the first time the store is used
+
+# Type of each renamed key from map_keys(), plus the raw created_at for exact ordering
+_COLUMN_TYPES = [
+    ('action_id', 'string'), ('event', 'string'), ('item_type', 'string'), ('user_id', 'string'),
+    ('created_at', 'int64'), ('event_date', 'date'), ('board_id', 'int64'), ('group_id', 'string'),
+    ('group_name', 'string'), ('pulse_id', 'int64'), ('pulse_name', 'string'), ('column_id', 'string'),
+    ('column_name', 'string'), ('new_date', 'date'), ('prior_value', 'string'), ('item_id', 'int64'),
+    ('item_name', 'string'), ('new_text', 'string'), ('date_last_changed', 'date'), ('prior_text', 'string'),
+    ('value_text', 'string'), ('is_done', 'bool'), ('prior_value_text', 'string'), ('prior_value_date', 'date'),
+    ('value_name', 'string'), ('prior_value_name', 'string'), ('source_board_id', 'int64'),
+    ('source_board_name', 'string'), ('destination_board_id', 'int64'), ('destination_board_name', 'string'),
+    ('source_group_id', 'string'), ('source_group_title', 'string'), ('destination_group_id', 'string'),
+    ('destination_group_title', 'string'), ('group_title', 'string'), ('source_pulse_id', 'int64'),
+    ('destination_pulse_id', 'int64'),
+    ]
+COLUMNS = [name for name, _ in _COLUMN_TYPES]
+
+
+def _require_pyarrow():
+    global pa, ds, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.dataset
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The Parquet activity store needs pyarrow: pip install pyarrow")
+        pa, ds, pq = pyarrow, pyarrow.dataset, pyarrow.parquet
+
+def store_schema():
+    """
+    Arrow schema for the stored actions (partition columns not included).
+    """
+    _require_pyarrow()
+    types = {'string': pa.string(), 'int64': pa.int64(), 'date': pa.date32(), 'bool': pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in _COLUMN_TYPES])
+
+def _coerce(value, kind):
+    # Fit a decoded json value to its column type
+    if value is None:
+        return None
+    if kind == 'int64':
+        return int(value)
+    if kind == 'string' and not isinstance(value, str):
+        return str(value)
+    return value
+
+def decode_activities(activities, units_dict=None):
+    """
+    Turn raw activity dicts (Monday.com envelope, data as a json string or dict)
+    into store rows: the map_keys() fields under their new names, with dates
+    converted and the raw created_at kept. Group names come from units_dict if
+    given, otherwise from the shared cache for each action's board.
+    """
+    from organize_create_projects import compile_projection, map_keys, project_dict # Only once there's activity to decode
+    key_map, my_keys_list = map_keys()
+    projection = compile_projection(key_map)
+    rows = []
+    for activity in activities:
+        activity_data(activity)
+        row = project_dict(activity, projection)
+        row['created_at'] = int(activity['created_at'])
+        if 'group_id' in row:
+            if units_dict is not None:
+                row['group_name'] = units_dict.get(row['group_id'])
+            elif 'board_id' in row:
+                row['group_name'] = group_names.get(row['board_id'], row['group_id'])
+        rows.append(row)
+    normalize_dates(rows, created_at_keys=['event_date'], date_keys=['prior_value_date', 'new_date', 'date_last_changed'])
+    kinds = dict(_COLUMN_TYPES)
+    for row in rows:
+        for key, value in row.items():
+            row[key] = _coerce(value, kinds[key])
+    return rows
+
+def _stored_ids(partition_dir):
+    # The action ids already in a partition
+    if not os.path.isdir(partition_dir):
+        return set()
+    return set(read_partition(partition_dir, columns=['action_id']).column('action_id').to_pylist())
+
+def append_activities(store_root, board_id, activities, units_dict=None):
+    """
+    Add activities for one board to the store, as one new Parquet file for each
+    month they cover, leaving out any whose id is already stored for that board
+    and month (or that come up twice). Existing files are never touched. Returns
+    the paths written.
+    """
+    _require_pyarrow()
+    by_month = defaultdict(list)
+    for row in decode_activities(activities, units_dict):
+        by_month[row['event_date'].strftime('%Y-%m')].append(row)
+    schema = store_schema()
+    paths = []
+    for month, rows in sorted(by_month.items()):
+        partition_dir = os.path.join(store_root, f'board_id={board_id}', f'month={month}')
+        seen = _stored_ids(partition_dir)
+        new_rows = []
+        for row in rows:
+            if row.get('action_id') not in seen:
+                seen.add(row.get('action_id'))
+                new_rows.append(row)
+        if not new_rows:
+            continue
+        new_rows.sort(key=lambda row: row['created_at'])
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f'part-{new_rows[0]["created_at"]}-{uuid.uuid4().hex[:8]}.parquet')
+        table = pa.Table.from_pylist(new_rows, schema=schema)
+        pq.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path) # Readers never see a half-written file
+        paths.append(path)
+    return paths
+
+def import_json_file(store_root, board_id, data_file, units_dict=None, chunk_size=100000):
+    """
+    Load a (quarterly or merged) json file of activity into the store,
+    streaming it through in chunks.
+    """
+    paths = []
+    chunk = []
+    for activity in iter_activities(data_file):
+        chunk.append(activity)
+        if len(chunk) >= chunk_size:
+            paths += append_activities(store_root, board_id, chunk, units_dict)
+            chunk = []
+    if chunk:
+        paths += append_activities(store_root, board_id, chunk, units_dict)
+    return paths
+
+def _month(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m')
+    return value
+
+def open_store(store_root):
+    """
+    The whole store as a pyarrow dataset, with board_id and month as partition columns.
+    """
+    _require_pyarrow()
+    partitioning = ds.partitioning(pa.schema([('board_id', pa.int64()), ('month', pa.string())]), flavor='hive')
+    schema = store_schema().append(pa.field('month', pa.string())) # board_id is stored in the files too
+    return ds.dataset(store_root, format='parquet', partitioning=partitioning, schema=schema)
+
+def store_partitions(store_root, board_ids=None):
+    """
+    List the (board_id, month, directory) of each partition in the store,
+    optionally just for some boards, in board and month order.
+    """
+    partitions = []
+    if not os.path.isdir(store_root):
+        return partitions
+    wanted = None if board_ids is None else {int(board_id) for board_id in board_ids}
+    for board_dir in sorted(os.listdir(store_root)):
+        if not board_dir.startswith('board_id='):
+            continue
+        board_id = int(board_dir.split('=', 1)[1])
+        if wanted is not None and board_id not in wanted:
+            continue
+        for month_dir in sorted(os.listdir(os.path.join(store_root, board_dir))):
+            if month_dir.startswith('month='):
+                partitions.append((board_id, month_dir.split('=', 1)[1], os.path.join(store_root, board_dir, month_dir)))
+    return partitions
+
+def read_partition(partition_dir, columns=None):
+    """
+    Read the given columns of a single partition directory as a pyarrow Table.
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(partition_dir, format='parquet', schema=store_schema())
+    return dataset.to_table(columns=columns)
+
+def read_actions(store_root, columns=None, board_ids=None, from_date=None, to_date=None, filter=None):
+    """
+    Read stored actions as a pyarrow Table. Only the given columns are read,
+    and only the partitions for the given boards and the months between
+    from_date and to_date (dates or 'YYYY-MM' strings) are opened at all.
+    Any other pyarrow filter expression can be passed in as well.
+    """
+    dataset = open_store(store_root)
+    expressions = []
+    if board_ids is not None:
+        expressions.append(ds.field('board_id').isin([int(board_id) for board_id in board_ids]))
+    if from_date is not None:
+        expressions.append(ds.field('month') >= _month(from_date))
+        if isinstance(from_date, datetime.date):
+            expressions.append(ds.field('event_date') >= from_date)
+    if to_date is not None:
+        expressions.append(ds.field('month') <= _month(to_date))
+        if isinstance(to_date, datetime.date):
+            expressions.append(ds.field('event_date') <= to_date)
+    if filter is not None:
+        expressions.append(filter)
+    combined = None
+    for expression in expressions:
+        combined = expression if combined is None else combined & expression
+    table = dataset.to_table(columns=columns, filter=combined)
+    if 'created_at' in table.column_names:
+        table = table.sort_by('created_at')
+    return table
+
+def iter_store_actions(store_root, columns=None, **read_options):
+    """
+    Stored actions as dicts shaped like the ones the organizer scripts build,
+    with keys left out where the value is empty.
+    """
+    if columns is None:
+        columns = COLUMNS # Leave out the month partition
+    table = read_actions(store_root, columns=columns, **read_options)
+    for batch in table.to_batches():
+        for row in batch.to_pylist():
+            yield {key: value for key, value in row.items() if value is not None}
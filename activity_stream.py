@@ -0,0 +1,242 @@
+"""
+Reads the merged json files of activity logs incrementally, handing back one
+activity at a time, and leaves the 'data' level (which Monday.com sends as a
+json string) undecoded until something actually asks for it. Each file is one
+big array of activity dicts, and loading the whole thing with json.load means
+holding every activity in memory before the organizer scripts even start.
+Merging several files is done the same way, streaming them together in
+created_at order.
+"""
+
+# Python built-in modules
+import heapq
+import io
+import json
+import os
+import tempfile
+
+# Local modules
+import json_backend
+from instrumentation import iter_stage
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(fp, chunk_size=65536, offsets=False, resume=False):
+    """
+    Yield the items of a top-level json array from an open text file,
+    reading it in chunks so only the current item is ever fully in memory.
+    With offsets, yield (byte offset in the file, item) for each item instead.
+    With resume, the file is positioned at an item partway through the array
+    (at an offset given before), rather than at the start of the array.
+    """
+    buf = ''
+    pos = 0
+    eof = False
+    encoding = getattr(fp, 'encoding', None) or 'utf-8'
+    mark_pos = 0 # Position in buf up to which bytes have been counted
+    mark_bytes = 0 # Bytes before buf[mark_pos], counted only with offsets
+
+    def byte_offset(index):
+        # Bytes in the file before buf[index], counting on from the last call
+        nonlocal mark_pos, mark_bytes
+        mark_bytes += len(buf[mark_pos:index].encode(encoding))
+        mark_pos = index
+        return mark_bytes
+
+    def fill():
+        # Read another chunk, dropping what's already been parsed
+        nonlocal buf, pos, eof, mark_pos
+        if offsets:
+            byte_offset(pos)
+            mark_pos = 0
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if not resume:
+        if pos >= len(buf) or buf[pos] != '[':
+            raise ValueError("Expected a json array of activities")
+        pos += 1
+    expect_item = True # Can't have a comma or ']' right after '[' or ','
+    first = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of file inside json array")
+        if buf[pos] == ']':
+            if expect_item and not first:
+                raise ValueError("Trailing comma in json array")
+            return
+        if not expect_item:
+            if buf[pos] != ',':
+                raise ValueError(f"Expected ',' or ']' in json array, got {buf[pos]!r}")
+            pos += 1
+            expect_item = True
+            continue
+        if offsets:
+            item_offset = byte_offset(pos)
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill() # Item runs past the end of the buffer
+                continue
+            if end == len(buf) and not eof:
+                fill() # A bare number could still continue in the next chunk
+                continue
+            break
+        pos = end
+        first = False
+        expect_item = False
+        yield (item_offset, item) if offsets else item
+
+def iter_activities(data_file, decode_data=False, chunk_size=65536):
+    """
+    Yield each activity dict from a merged json file of activity logs.
+    The 'data' level is left as its json string unless decode_data is True;
+    use activity_data() to decode it only for the activities that need it.
+    """
+    with open(data_file) as f:
+        activities = iter_stage('read_json', iter_json_array(f, chunk_size))
+        if decode_data:
+            activities = iter_stage('decode_data', _iter_decoded(activities))
+        yield from activities
+
+def _iter_decoded(activities):
+    for activity in activities:
+        activity_data(activity)
+        yield activity
+
+def activity_data(activity):
+    """
+    Return the decoded 'data' level of an activity, decoding the json string
+    the first time it's asked for and keeping the result on the activity.
+    Uses the fastest json library installed, see json_backend.py.
+    """
+    data_level = activity.get('data')
+    if isinstance(data_level, str):
+        data_level = json_backend.loads(data_level) # Normalize level that comes as json string
+        activity['data'] = data_level
+    return data_level
+
+def _created_at(activity):
+    return int(activity['created_at'])
+
+MAX_OPEN_RUNS = 64 # Runs read at once while merging; more are first merged in batches through temp files
+
+def _sorted_runs(data_file, descending, chunk_size):
+    # (byte offset, number of items) of each stretch of the file that's already in created_at
+    # order. A quarterly file is one run; a file merged the old way has one run per quarter.
+    runs = []
+    start = None
+    count = 0
+    previous = None
+    with open(data_file, encoding='utf-8') as f:
+        for offset, activity in iter_json_array(f, chunk_size, offsets=True):
+            created_at = _created_at(activity)
+            if previous is None or (created_at > previous if descending else created_at < previous):
+                if start is not None:
+                    runs.append((start, count))
+                start, count = offset, 0
+            previous = created_at
+            count += 1
+    if start is not None:
+        runs.append((start, count))
+    return runs
+
+def _iter_run(data_file, offset, count, chunk_size):
+    # Stream the count items starting at a byte offset of a file, without parsing what's before it
+    with open(data_file, 'rb') as raw:
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, encoding='utf-8') as f:
+            for position, activity in enumerate(iter_json_array(f, chunk_size, resume=True)):
+                if position >= count:
+                    return
+                yield activity
+
+def _merge_runs(runs, descending):
+    # Merge iterables each in created_at order, dropping repeats of an activity id.
+    # Repeats share a created_at, so ids only need remembering for the current created_at.
+    current_created_at = None
+    current_ids = set()
+    for activity in heapq.merge(*runs, key=_created_at, reverse=descending):
+        created_at = _created_at(activity)
+        if created_at != current_created_at:
+            current_created_at = created_at
+            current_ids = set()
+        if activity['id'] in current_ids:
+            continue
+        current_ids.add(activity['id'])
+        yield activity
+
+def iter_merged_activities(data_files, descending=True, chunk_size=65536, max_open_runs=MAX_OPEN_RUNS):
+    """
+    Stream the activities of several json files merged into one sequence in
+    created_at order (newest first by default, the order Monday.com returns them),
+    dropping repeats of an activity id. Each file is read incrementally, and a file
+    that isn't in order as a whole is split into the stretches that are, each read
+    from where it starts in the file, so only one activity per stretch is held at
+    a time. With more than max_open_runs stretches, they're merged max_open_runs
+    at a time into temp files first, so only that many files are ever open.
+    """
+    runs = [(data_file, offset, count) for data_file in data_files
+            for offset, count in _sorted_runs(data_file, descending, chunk_size)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_files = 0
+        while len(runs) > max_open_runs:
+            merged = []
+            for start in range(0, len(runs), max_open_runs):
+                batch = runs[start:start + max_open_runs]
+                temp_file = os.path.join(temp_dir, f'run{temp_files}.json')
+                temp_files += 1
+                count = write_json_array(_merge_runs([_iter_run(*run, chunk_size) for run in batch], descending),
+                                         temp_file)
+                merged.append((temp_file, 1, count)) # The first item comes right after the '['
+                for path, offset, count in batch:
+                    if os.path.dirname(path) == temp_dir: # Done with an earlier batch's file
+                        os.remove(path)
+            runs = merged
+        yield from _merge_runs([_iter_run(*run, chunk_size) for run in runs], descending)
+
+def write_json_array(activities, newfile):
+    """
+    Write activities to newfile as a json array one at a time, in the same
+    format json.dump would, replacing newfile only once it's complete.
+    Returns the number written.
+    """
+    temp_file = newfile + '.tmp'
+    count = 0
+    with open(temp_file, 'w') as output_file:
+        output_file.write('[')
+        for activity in activities:
+            if count:
+                output_file.write(', ')
+            output_file.write(json.dumps(activity))
+            count += 1
+        output_file.write(']')
+    os.replace(temp_file, newfile)
+    return count
+
+def merge_activity_files(data_files, newfile, descending=True, chunk_size=65536):
+    """
+    Merge json files of activity (e.g. quarterly downloads) into newfile in
+    created_at order without duplicates, never holding the whole history in memory.
+    Returns the number of activities written.
+    """
+    return write_json_array(iter_merged_activities(data_files, descending, chunk_size), newfile)
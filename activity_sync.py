@@ -0,0 +1,248 @@
+"""
+Keeps each board's merged json file up to date by fetching only what's new,
+rather than re-downloading whole quarters and merging the files again. A small
+state file records, for each board, the latest created_at we have and the ids
+of the activities at that moment. Each sync asks Monday.com for activity from
+that point on, drops anything we already have, and appends the rest to the end
+of the board's merged file without rewriting it, newest first like the
+quarterly files, so the file stays in runs sorted the same way.
+
+The mark the append will move the board to is saved (as pending, along with the
+file's size and the number of activities) before appending. If a sync stops
+before saving the new mark, the next one sees from the file's size whether the
+append happened, so it neither appends the same activities twice nor skips
+them. If it did happen, the appended activities are read back from the end of
+the file and added to the Parquet store and project summaries again, since the
+sync may have stopped before getting to them; both skip what they already have.
+"""
+
+# Python built-in modules
+import asyncio
+import datetime
+import json
+import os
+from collections import deque
+
+# Local modules
+from activity_fetcher import DATE_FORMAT, ActivityFetcher
+from activity_stream import iter_activities
+
+state_file = '/Users/douglasray/Projects/monday_actions/data_files/sync_state.json'
+# Board id and the file its project summaries are kept up to date in, see project_summaries.py
+summary_files = {
+    592284362: '/Users/douglasray/Projects/monday_actions/data_files/creative_projects/project_summaries.pickle',
+    }
+start_date = '2021-01-01T00:00:00Z' # Where to start for a board we have nothing for yet
+
+# Board id and the merged json file that holds its activity
+board_stores = {
+    592284362: '/Users/douglasray/Projects/monday_actions/data_files/creative_projects/2021-23_creative_projects_merged.json',
+    736608574: '/Users/douglasray/Projects/monday_actions/data_files/events/2021-23_events_merged.json',
+    }
+
+
+def _created_at_second(created_at):
+    # Monday.com created_at (1e-7 second units) down to the whole second
+    return int(created_at) // 10000000
+
+def _second_to_date_string(second):
+    return datetime.datetime.fromtimestamp(second, datetime.timezone.utc).strftime(DATE_FORMAT)
+
+def load_state(state_file):
+    """
+    Read the sync state, a dict of board id (as a string) to its high-water mark.
+    """
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file) as f:
+        return json.load(f)
+
+def save_state(state, state_file):
+    """
+    Write the sync state, replacing the old file only once the new one is complete.
+    """
+    temp_file = state_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(temp_file, state_file)
+
+def advance_mark(mark, activities):
+    """
+    Move a board's high-water mark past a batch of activities. The mark keeps
+    the latest created_at seen and the ids of every activity in that same second,
+    since the next query starts at that second and will return them again.
+    """
+    mark = dict(mark or {'created_at': None, 'boundary_ids': []})
+    boundary_ids = set(mark['boundary_ids'])
+    latest = mark['created_at']
+    latest_value = None if latest is None else int(latest)
+    for activity in activities:
+        created_at = activity['created_at']
+        value = int(created_at)
+        if latest_value is None or value > latest_value:
+            if latest_value is None or _created_at_second(value) > _created_at_second(latest_value):
+                boundary_ids = set()
+            latest, latest_value = created_at, value
+        if _created_at_second(value) == _created_at_second(latest_value):
+            boundary_ids.add(activity['id'])
+    mark['created_at'] = latest
+    mark['boundary_ids'] = sorted(boundary_ids)
+    return mark
+
+def mark_from_store(store_file):
+    """
+    Build a high-water mark by reading through a board's existing merged file,
+    for boards that were downloaded before incremental syncs.
+    """
+    if not os.path.exists(store_file):
+        return None
+    mark = advance_mark(None, iter_activities(store_file)) # One pass over the whole file
+    return mark if mark['created_at'] is not None else None
+
+def new_activities(mark, activities):
+    """
+    Drop activities we already have: anything older than the mark's second,
+    and anything in that second whose id we've already stored.
+    """
+    if not mark or mark.get('created_at') is None:
+        return list(activities)
+    mark_second = _created_at_second(mark['created_at'])
+    boundary_ids = set(mark['boundary_ids'])
+    kept = []
+    for activity in activities:
+        second = _created_at_second(activity['created_at'])
+        if second > mark_second or (second == mark_second and activity['id'] not in boundary_ids):
+            kept.append(activity)
+    return kept
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def settle_pending(mark, store_file, board_id=None, store_root=None, summary_file=None):
+    """
+    A board's mark as it stands, if the last sync stopped while appending: the
+    pending mark if the merged file changed size (the append happened), otherwise
+    the mark from before it. If the append happened, the activities it appended
+    are applied to the Parquet store and the project summaries again, as
+    sync_boards does after appending.
+    """
+    if not mark or 'pending' not in mark:
+        return mark
+    pending = mark['pending']
+    if _file_size(store_file) == pending['size']:
+        settled = dict(mark)
+    else:
+        appended = list(deque(iter_activities(store_file), maxlen=pending['count'])) # The end of the file
+        apply_new_activities(board_id, appended, store_file, store_root, summary_file, sync=pending['size'])
+        settled = dict(pending['mark'])
+    settled.pop('pending', None)
+    return settled or None # Nothing was stored before the first append
+
+def apply_new_activities(board_id, activities, store_file, store_root=None, summary_file=None, sync=None):
+    """
+    Add a board's newly appended activities to the Parquet store at store_root
+    (see activity_store.py) and to the project summaries in summary_file (see
+    project_summaries.py), for whichever of them are given. Both leave out what
+    they already have, so this can safely be run again for the same activities.
+    """
+    if store_root and activities:
+        from activity_store import append_activities
+        append_activities(store_root, board_id, activities)
+    if summary_file:
+        from project_summaries import update_summary_file
+        update_summary_file(summary_file, activities, data_file=store_file, sync=sync)
+
+def append_to_json_array(store_file, activities):
+    """
+    Append activities to the json array in store_file in place, by overwriting
+    its closing bracket, so the existing contents never have to be re-read.
+    """
+    if not activities:
+        return
+    body = ', '.join(json.dumps(activity) for activity in activities).encode()
+    if not os.path.exists(store_file) or os.path.getsize(store_file) == 0:
+        with open(store_file, 'wb') as f:
+            f.write(b'[' + body + b']')
+        return
+    with open(store_file, 'r+b') as f:
+        # Walk back from the end past whitespace to the closing bracket
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            position -= 1
+            f.seek(position)
+            char = f.read(1)
+            if not char.isspace():
+                break
+        if char != b']':
+            raise ValueError(f'{store_file} does not end with a json array')
+        # Check whether the array is empty, to know if a comma is needed
+        before = position
+        while before > 0:
+            before -= 1
+            f.seek(before)
+            previous = f.read(1)
+            if not previous.isspace():
+                break
+        separator = b'' if previous == b'[' else b', '
+        f.seek(position)
+        f.truncate()
+        f.write(separator + body + b']')
+
+def sync_boards(board_stores, state_file, start_date=start_date, to_date=None, store_root=None, summary_files=None,
+                **fetcher_options):
+    """
+    Bring each board's merged json file up to date. Boards are fetched concurrently;
+    each one only from its high-water mark on. With store_root, new activity is also
+    added to that Parquet store (see activity_store.py), and with summary_files, a
+    dict of board id to file, the new activity is applied to that board's project
+    summaries (see project_summaries.py). Returns a dict of board id to the number
+    of new activities appended.
+    """
+    state = load_state(state_file)
+    if to_date is None:
+        to_date = datetime.datetime.now(datetime.timezone.utc).strftime(DATE_FORMAT)
+    board_windows = {}
+    summary_files = summary_files or {}
+    for board_id, store_file in board_stores.items():
+        mark = settle_pending(state.get(str(board_id)), store_file, board_id, store_root, summary_files.get(board_id))
+        if mark is not None:
+            state[str(board_id)] = mark
+        else: # First sync for this board: pick up from whatever is already stored
+            mark = mark_from_store(store_file)
+            if mark is not None:
+                state[str(board_id)] = mark
+        if mark is None or mark.get('created_at') is None:
+            from_date = start_date
+        else:
+            from_date = _second_to_date_string(_created_at_second(mark['created_at']))
+        board_windows[board_id] = [(from_date, to_date)]
+
+    fetcher = ActivityFetcher(**fetcher_options)
+    board_activity = asyncio.run(fetcher.fetch_board_windows(board_windows))
+
+    added = {}
+    for board_id, activities in board_activity.items():
+        mark = state.get(str(board_id))
+        activities = new_activities(mark, activities)
+        activities.sort(key=lambda activity: int(activity['created_at']), reverse=True) # Newest first, like the rest of the file
+        new_mark = advance_mark(mark, activities)
+        new_mark.pop('pending', None)
+        size = _file_size(board_stores[board_id])
+        if activities:
+            # Saved first, so a stop before the new mark is saved below can be settled next time
+            state[str(board_id)] = dict(mark or {}, pending={'size': size, 'count': len(activities), 'mark': new_mark})
+            save_state(state, state_file)
+        append_to_json_array(board_stores[board_id], activities)
+        apply_new_activities(board_id, activities, board_stores[board_id], store_root, summary_files.get(board_id),
+                             sync=size if activities else None)
+        state[str(board_id)] = new_mark
+        state[str(board_id)]['last_sync'] = to_date
+        save_state(state, state_file) # After each board, so a failure doesn't lose finished work
+        added[board_id] = len(activities)
+    return added
+
+if __name__ == "__main__":
+    api_key = os.environ.get('MONDAY_API_KEY')
+    added = sync_boards(board_stores, state_file, summary_files=summary_files, api_key=api_key)
+    for board_id, count in added.items():
+        print(board_id, count)
@@ -0,0 +1,708 @@
+"""
+Rough timing checks for the organizer scripts, run against synthetic activity
+rather than our private merged json files. Run this script directly and pick
+a benchmark by name, e.g.:
+
+    python benchmarks.py action_index --sizes 10000 100000 1000000
+
+Save the results with --record, and check a later run against them with
+--compare, e.g.:
+
+    python benchmarks.py end_to_end --record benchmark_results/end_to_end.json
+    python benchmarks.py end_to_end --compare benchmark_results/end_to_end.json
+
+python benchmarks.py imports checks that importing each module stays quick.
+It, and --compare, exit non-zero if anything got slower, so they can gate a change.
+A benchmark that checks two ways of doing something agree (its *matches columns)
+exits non-zero if they don't; tests/ has the same checks on awkward cases.
+"""
+
+# Python built-in modules
+import argparse
+import datetime
+import random
+import sys
+import time
+
+# Local modules
+from action_index import ActionIndex
+import organize_create_projects as ocp
+
+
+def make_synthetic_activities(n_actions, seed=0):
+    """
+    A list of n_actions made-up activities for the creative projects board from
+    synthetic_activity.py, in the Monday.com envelope, with the 'data' level
+    already decoded.
+    """
+    from activity_stream import activity_data
+    from synthetic_activity import iter_synthetic_activities
+    activities = list(iter_synthetic_activities(n_actions, 'projects', seed))
+    for activity in activities:
+        activity_data(activity)
+    return activities
+
+def make_synthetic_actions(n_actions, seed=0):
+    """
+    The projected action dicts (renamed keys, like the output of checkKey) of
+    n_actions made-up activities from synthetic_activity.py, leaving out the
+    few that aren't project actions.
+    """
+    key_map, my_keys_list = ocp.map_keys()
+    projection = ocp.compile_projection(key_map)
+    return list(ocp.iter_pulses(ocp.project_activities(make_synthetic_activities(n_actions, seed), ocp.units_dict,
+                                                       projection)))
+
+def _gather_by_rescan(unique_pulse_ids, pulse_list):
+    # The old approach: rescan the whole list of actions for each pulse id
+    gathered_projects = []
+    for pulse_id in unique_pulse_ids:
+        gathered_projects.append([item for item in pulse_list if item['pulse_id'] == pulse_id])
+    return gathered_projects
+
+def bench_action_index(sizes, rescan_limit=20000):
+    """
+    Time grouping actions by pulse with an ActionIndex against rescanning the
+    list per pulse id. The rescan is quadratic, so it's only run for small sizes.
+    """
+    results = []
+    for n in sizes:
+        actions = make_synthetic_actions(n)
+        t0 = time.perf_counter()
+        index = ActionIndex(actions)
+        unique_pulse_ids = ocp.create_unique_pulse_id_list(index)
+        ocp.gather_dicts_by_pulse(unique_pulse_ids, index)
+        indexed = time.perf_counter() - t0
+        row = {'actions': n, 'pulses': len(unique_pulse_ids), 'indexed_s': round(indexed, 4),
+               'ns_per_action': round(indexed / n * 1e9)}
+        if n <= rescan_limit:
+            t0 = time.perf_counter()
+            _gather_by_rescan(unique_pulse_ids, actions)
+            row['rescan_s'] = round(time.perf_counter() - t0, 4)
+        results.append(row)
+        print(row)
+    return results
+
+def bench_flatten(sizes, normalize_limit=20000):
+    """
+    Time flatten_dict (native), flatten_dicts in batch mode, and the old
+    one-json_normalize-per-record approach, checking that all three agree.
+    """
+    import pandas as pd
+    results = []
+    for n in sizes:
+        activities = make_synthetic_activities(n)
+        t0 = time.perf_counter()
+        native = ocp.flatten_dicts(activities)
+        row = {'actions': n, 'native_s': round(time.perf_counter() - t0, 4)}
+        t0 = time.perf_counter()
+        batch = ocp.flatten_dicts(activities, batch=True)
+        row['batch_s'] = round(time.perf_counter() - t0, 4)
+        # Batch mode drops None values, so compare it against native without them
+        row['batch_matches'] = batch == [{k: v for k, v in d.items() if v is not None} for d in native]
+        if n <= normalize_limit:
+            t0 = time.perf_counter()
+            per_record = [pd.json_normalize(elem, sep='.').to_dict(orient='records')[0] for elem in activities]
+            row['per_record_s'] = round(time.perf_counter() - t0, 4)
+            row['native_matches'] = all(list(a.items()) == list(b.items()) for a, b in zip(native, per_record))
+        results.append(row)
+        print(row)
+    return results
+
+def bench_dates(sizes):
+    """
+    Compare converting created_at and date strings one row at a time against
+    converting whole columns at once with monday_dates.
+    """
+    import monday_dates
+    results = []
+    for n in sizes:
+        activities = make_synthetic_activities(n)
+        created = [elem['created_at'] for elem in activities]
+        dates = [f'{2021 + i % 3}-{1 + i % 12:02d}-{1 + i % 28:02d}' + ('T17:18:57.640Z' if i % 2 else '')
+                 for i in range(n)] # Half with a time part to trim
+        row = {'values': n}
+        t0 = time.perf_counter()
+        per_row = [monday_dates.created_at_to_date(v) for v in created]
+        per_row_dates = [monday_dates.string_to_date(v) for v in dates]
+        row['per_row_s'] = round(time.perf_counter() - t0, 4)
+        t0 = time.perf_counter()
+        columnar = monday_dates.created_at_to_dates(created)
+        columnar_dates = monday_dates.strings_to_dates(dates)
+        row['columnar_s'] = round(time.perf_counter() - t0, 4)
+        row['speedup'] = round(row['per_row_s'] / row['columnar_s'], 1)
+        row['matches'] = per_row == columnar and per_row_dates == columnar_dates
+        results.append(row)
+        print(row)
+    return results
+
+def write_synthetic_quarters(dir_path, n_files, actions_per_file, overlap=0.01):
+    """
+    Write n_files quarterly-style json files of synthetic activity (see
+    synthetic_activity.py), each newest first like Monday.com returns them,
+    plus one extra file repeating the first `overlap` share of the first file,
+    so a merge has duplicates to drop. Activities are written as they're made
+    up, so files can be much bigger than memory.
+    """
+    import json
+    from synthetic_activity import iter_synthetic_activities
+    quarter = 3 * 30 * 86400 * 10000000 # About a quarter, in monday.com's 1e-7 second units
+    step = quarter // actions_per_file
+    paths = [f'{dir_path}/synthetic_q{k}.json' for k in range(n_files)] + [f'{dir_path}/synthetic_overlap.json']
+    overlap_file = open(paths[-1], 'w')
+    overlap_file.write('[')
+    n_overlap = int(actions_per_file * overlap)
+    for k in range(n_files):
+        end = 16094592000000000 + (k + 1) * quarter
+        with open(paths[k], 'w') as f:
+            f.write('[')
+            for i, activity in enumerate(iter_synthetic_activities(actions_per_file, 'projects', seed=k)):
+                activity['id'] = f'q{k}-{i}' # Spread evenly over the quarter, with ids unique across files
+                activity['created_at'] = str(end - i * step)
+                text = json.dumps(activity)
+                f.write((', ' if i else '') + text)
+                if k == 0 and i < n_overlap:
+                    overlap_file.write((', ' if i else '') + text)
+            f.write(']')
+    overlap_file.write(']')
+    overlap_file.close()
+    return paths
+
+def bench_merge(sizes, n_files=4):
+    """
+    Merge synthetic quarterly files with activity_stream.merge_activity_files,
+    reporting throughput and peak memory. Sizes are actions per file, so
+    1000000 actions x 4 files is a bit over 2 GB of input.
+    """
+    import os
+    import resource
+    import tempfile
+    from activity_stream import merge_activity_files
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            paths = write_synthetic_quarters(dir_path, n_files, n)
+            input_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+            t0 = time.perf_counter()
+            written = merge_activity_files(paths, f'{dir_path}/merged.json')
+            elapsed = time.perf_counter() - t0
+            row = {'actions_per_file': n, 'input_mb': round(input_mb, 1), 'written': written,
+                   'dropped_duplicates': n * n_files + int(n * 0.01) - written, 'merge_s': round(elapsed, 2),
+                   'mb_per_s': round(input_mb / elapsed, 1),
+                   'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        results.append(row)
+        print(row)
+    return results
+
+def bench_parallel(sizes, worker_counts=(2, 4, 8), n_quarters=12, chunk_size=5000):
+    """
+    Time make_activity_list decoding a synthetic multi-year merged log (n_quarters
+    quarterly files merged) in one process against a pool of worker processes,
+    checking the results match. The speedup depends on the cores actually free,
+    which is reported as cpu_count.
+    """
+    import os
+    import tempfile
+    from activity_stream import merge_activity_files
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            paths = write_synthetic_quarters(dir_path, n_quarters, max(1, n // n_quarters), overlap=0)
+            merged = f'{dir_path}/merged.json'
+            merge_activity_files(paths, merged)
+            row = {'actions': n, 'cpu_count': os.cpu_count()}
+            t0 = time.perf_counter()
+            serial_keys, serial = ocp.make_activity_list(merged, ocp.units_dict)
+            row['serial_s'] = round(time.perf_counter() - t0, 2)
+            for workers in worker_counts:
+                t0 = time.perf_counter()
+                parallel_keys, parallel = ocp.make_activity_list(merged, ocp.units_dict, workers=workers,
+                                                                 chunk_size=chunk_size)
+                elapsed = time.perf_counter() - t0
+                row[f'workers_{workers}_s'] = round(elapsed, 2)
+                row[f'workers_{workers}_speedup'] = round(row['serial_s'] / elapsed, 2)
+                row[f'workers_{workers}_matches'] = parallel == serial
+        results.append(row)
+        print(row)
+    return results
+
+def _retained_bytes(load):
+    # Memory still held by whatever load() returns, measured with tracemalloc
+    import tracemalloc
+    tracemalloc.start()
+    result = load()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return retained
+
+def _iter_typed(activities):
+    # Activities with their data level decoded into activity_schemas' Structs
+    import activity_schemas
+    for activity in activities:
+        activity['data'] = activity_schemas.decode_activity_data(activity['event'], activity['data'])
+        yield activity
+
+def bench_decode(sizes):
+    """
+    Time reading a synthetic merged file and decoding every data level into
+    dicts with the standard library json module, into dicts with the fastest
+    installed backend (json_backend.py), and into typed Structs (activity_schemas.py,
+    if msgspec is installed), with the bytes per activity each one holds on to.
+    The file is streamed with activity_stream.iter_activities each time.
+    """
+    import tempfile
+    import json_backend
+    from activity_stream import iter_activities
+    try:
+        import activity_schemas
+    except ImportError: # No msgspec
+        activity_schemas = None
+    fastest = json_backend.current_backend()
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            data_file = write_synthetic_quarters(dir_path, 1, n, overlap=0)[0]
+            loaders = {}
+            for name in ['json', fastest]:
+                loaders[f'{name}_dicts'] = (name, lambda: list(iter_activities(data_file, decode_data=True)))
+            if activity_schemas is not None:
+                loaders['msgspec_structs'] = (fastest, lambda: list(_iter_typed(iter_activities(data_file))))
+            row = {'actions': n, 'fastest_backend': fastest}
+            for label, (backend, load) in loaders.items():
+                json_backend.use_backend(backend)
+                t0 = time.perf_counter()
+                load()
+                row[f'{label}_s'] = round(time.perf_counter() - t0, 3)
+                row[f'{label}_bytes_per_action'] = round(_retained_bytes(load) / n)
+            json_backend.use_backend(fastest)
+        results.append(row)
+        print(row)
+    return results
+
+def bench_actions(sizes):
+    """
+    Bytes per action held by the projected actions of a synthetic log, kept as
+    dicts against compact Actions (action_record.py). Each activity is decoded
+    from its json text as it's projected, so the actions own their strings like
+    they would reading a real file.
+    """
+    import json
+    import tracemalloc
+    from synthetic_activity import iter_synthetic_activities
+    key_map, my_keys_list = ocp.map_keys()
+    projection = ocp.compile_projection(key_map)
+    results = []
+    for n in sizes:
+        texts = [json.dumps(activity) for activity in iter_synthetic_activities(n)]
+        row = {'actions': n}
+        for compact in (False, True):
+            label = 'action' if compact else 'dict'
+            t0 = time.perf_counter()
+            tracemalloc.start()
+            actions = list(ocp.project_activities((json.loads(text) for text in texts), ocp.units_dict,
+                                                  projection, compact=compact))
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            row[f'{label}_s'] = round(time.perf_counter() - t0, 2)
+            row[f'{label}_bytes_per_action'] = round(retained / n)
+            del actions
+        row['saved'] = f"{1 - row['action_bytes_per_action'] / row['dict_bytes_per_action']:.0%}"
+        results.append(row)
+        print(row)
+    return results
+
+def bench_parse_cache(sizes):
+    """
+    Time getting the projected actions of a synthetic merged file the first time
+    (decoded, projected and cached) against a re-run that loads them from the
+    parse cache, checking both give the same actions.
+    """
+    import tempfile
+    import parse_cache
+    key_map, my_keys_list = ocp.map_keys()
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            data_file = write_synthetic_quarters(dir_path, 1, n, overlap=0)[0]
+            cache_dir = f'{dir_path}/cache'
+            row = {'actions': n}
+            t0 = time.perf_counter()
+            cold = parse_cache.cached_projected_actions(data_file, ocp.units_dict, key_map, cache_dir)
+            row['cold_s'] = round(time.perf_counter() - t0, 3)
+            t0 = time.perf_counter()
+            warm = parse_cache.cached_projected_actions(data_file, ocp.units_dict, key_map, cache_dir)
+            row['warm_s'] = round(time.perf_counter() - t0, 3)
+            row['speedup'] = round(row['cold_s'] / row['warm_s'], 1)
+            t0 = time.perf_counter()
+            warm_compact = parse_cache.cached_projected_actions(data_file, ocp.units_dict, key_map, cache_dir, compact=True)
+            row['warm_compact_s'] = round(time.perf_counter() - t0, 3) # Rebuilding Actions from the cache
+            row['matches'] = cold == warm == warm_compact
+        results.append(row)
+        print(row)
+    return results
+
+def bench_filtered_projects(sizes, loop_limit=1000000):
+    """
+    Time summarizing the projects of a Parquet activity store (see
+    activity_store.py) both ways organize_create_projects.py has done it:
+    reading the actions as dicts and looping over each project's with
+    build_filtered_projects, against reading them as a DataFrame for
+    build_filtered_projects_frame, checking they give the same summaries.
+    speedup is for the whole of each, reading included. It also times
+    building the DataFrame from the dicts with actions_frame, for actions
+    that don't come from the store (frame_from_dicts_s).
+    """
+    import os
+    import tempfile
+    from activity_store import import_json_file, iter_store_actions, read_actions
+    from synthetic_activity import write_synthetic_file
+    columns = ['created_at', 'event', 'event_date', 'pulse_id', 'pulse_name', 'group_id', 'group_name',
+               'column_name', 'new_text', 'new_date']
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            data_file = os.path.join(dir_path, 'projects.json')
+            store_root = os.path.join(dir_path, 'store')
+            write_synthetic_file(data_file, n, 'projects')
+            import_json_file(store_root, ocp.board_id, data_file, ocp.units_dict)
+            row = {'actions': n}
+            t0 = time.perf_counter()
+            df = read_actions(store_root, columns=columns, board_ids=[ocp.board_id]).to_pandas()
+            row['read_frame_s'] = round(time.perf_counter() - t0, 3)
+            t0 = time.perf_counter()
+            vectorized = ocp.build_filtered_projects_frame(df)
+            row['vectorized_s'] = round(time.perf_counter() - t0, 3)
+            row['pulses'] = len(vectorized)
+            if n <= loop_limit:
+                t0 = time.perf_counter()
+                actions = list(ocp.iter_pulses(iter_store_actions(store_root, columns=columns, board_ids=[ocp.board_id])))
+                index = ActionIndex(actions)
+                row['read_dicts_s'] = round(time.perf_counter() - t0, 3)
+                t0 = time.perf_counter()
+                looped = ocp.build_filtered_projects(index)
+                row['loop_s'] = round(time.perf_counter() - t0, 3)
+                row['speedup'] = round((row['read_dicts_s'] + row['loop_s']) / (row['read_frame_s'] + row['vectorized_s']), 1)
+                row['matches'] = vectorized == looped
+                t0 = time.perf_counter()
+                ocp.actions_frame(actions)
+                row['frame_from_dicts_s'] = round(time.perf_counter() - t0, 3)
+        results.append(row)
+        print(row)
+    return results
+
+def _peak_bytes(run):
+    # Peak memory allocated while run() runs, measured with tracemalloc
+    import tracemalloc
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def bench_export(sizes, to_excel_limit=300000):
+    """
+    Time writing the creative projects table, with its summary sheets, through
+    export.export() as xlsx, csv and Parquet, against DataFrame.to_excel. Sizes
+    are numbers of actions; each pulse gets about 15 of them.
+    """
+    import os
+    import tempfile
+    from export import export
+    import pandas as pd
+    results = []
+    for n in sizes:
+        index = ActionIndex(make_synthetic_actions(n))
+        gathered = ocp.gather_dicts_by_pulse(index.pulse_ids(), index)
+        # The log starts partway into the oldest pulses' lives, so some were never created in it
+        filtered = [project for project in ocp.build_filtered_projects(gathered) if 'created' in project]
+        df = ocp.build_filtered_df(ocp.define_project_types(filtered))
+        sheets = ocp.summary_sheets(df)
+        row = {'actions': n, 'rows': len(df)}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            runs = {f'export_{ext}': (lambda ext=ext: export(sheets, os.path.join(tmp_dir, f'projects.{ext}')))
+                    for ext in ['xlsx', 'csv', 'parquet']}
+            if n <= to_excel_limit:
+                def to_excel():
+                    with pd.ExcelWriter(os.path.join(tmp_dir, 'to_excel.xlsx')) as writer:
+                        for name, sheet in sheets.items():
+                            sheet.to_excel(writer, sheet_name=name)
+                runs['to_excel'] = to_excel
+            for name, run in runs.items():
+                t0 = time.perf_counter()
+                run()
+                row[f'{name}_s'] = round(time.perf_counter() - t0, 3)
+                row[f'{name}_peak_mb'] = round(_peak_bytes(run) / 1e6, 1)
+        results.append(row)
+        print(row)
+    return results
+
+def _time_stage(row, stage, function, *args):
+    # Run one stage, recording how long it took in row
+    t0 = time.perf_counter()
+    result = function(*args)
+    row[f'{stage}_s'] = round(time.perf_counter() - t0, 3)
+    return result
+
+def _finish_row(row, n):
+    row['total_s'] = round(sum(value for key, value in row.items() if key.endswith('_s')), 3)
+    row['actions_per_s'] = round(n / row['total_s']) if row['total_s'] else None
+    return row
+
+def bench_end_to_end(sizes, seed=0):
+    """
+    Run each organizer script, stage by stage, over a synthetic merged file of
+    its board (see synthetic_activity.py), giving one row of stage times per
+    organizer and size. Stages run one after another on lists, as the scripts
+    did originally, so each one's time is its own.
+    """
+    import os
+    import tempfile
+    import pandas as pd
+    import organize_creative_proj_subitems as subitems
+    import organize_events as events
+    from activity_stream import iter_activities
+    from synthetic_activity import write_synthetic_file
+    key_map, my_keys_list = ocp.map_keys()
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as dir_path:
+            files = {}
+            for board in ['projects', 'events', 'subitems']:
+                files[board] = os.path.join(dir_path, f'{board}.json')
+                write_synthetic_file(files[board], n, board, seed)
+
+            row = {'actions': n, 'organizer': 'creative_projects'}
+            keys, activity_dicts = _time_stage(row, 'make_activity_list', ocp.make_activity_list, files['projects'],
+                                               ocp.units_dict)
+            new_list = _time_stage(row, 'checkKey', ocp.checkKey, activity_dicts, my_keys_list, key_map)
+            del keys, activity_dicts
+            pulse_list = _time_stage(row, 'check_for_pulses', ocp.check_for_pulses, new_list)
+            index = _time_stage(row, 'action_index', ActionIndex, pulse_list)
+            unique_pulse_ids = _time_stage(row, 'create_unique_pulse_id_list', ocp.create_unique_pulse_id_list, index)
+            gathered = _time_stage(row, 'gather_dicts_by_pulse', ocp.gather_dicts_by_pulse, unique_pulse_ids, index)
+            filtered = _time_stage(row, 'build_filtered_projects', ocp.build_filtered_projects, gathered)
+            typed = _time_stage(row, 'define_project_types', ocp.define_project_types, filtered)
+            df = _time_stage(row, 'build_filtered_df', ocp.build_filtered_df, typed)
+            row['rows'] = len(df)
+            results.append(_finish_row(row, n))
+            print(row)
+
+            row = {'actions': n, 'organizer': 'events'}
+            grouped = _time_stage(row, 'build_pulse_events_list', lambda path: events.build_pulse_events_list(
+                iter_activities(path)), files['events'])
+            records = _time_stage(row, 'consolidate_events', events.consolidate_events, *grouped)
+            df = _time_stage(row, 'dataframe', pd.DataFrame, records)
+            row['rows'] = len(df)
+            results.append(_finish_row(row, n))
+            print(row)
+
+            row = {'actions': n, 'organizer': 'subitems'}
+            action_dicts, created, archived, pulse_ids = _time_stage(row, 'build_lists', subitems.build_lists,
+                                                                     files['subitems'])
+            records = _time_stage(row, 'consolidate_subitems', subitems.consolidate_subitems, created, archived, pulse_ids)
+            df = _time_stage(row, 'dataframe', pd.DataFrame, records)
+            row['rows'] = len(df)
+            results.append(_finish_row(row, n))
+            print(row)
+    return results
+
+def _rollup_by_scan(projects, subitems):
+    # What a VLOOKUP does: look through every subitem for each project
+    for project in projects:
+        mine = [subitem for subitem in subitems if subitem.get('parent_id') == project['pulse_id']]
+        project['subitems'] = len(mine)
+    return projects
+
+def bench_rollup(sizes, scan_limit=20000):
+    """
+    Time adding up subitems onto their projects with subitem_rollup's index,
+    against scanning the subitems for each project. Sizes are numbers of
+    subitems, about 4 to a project, each with a create action and most with
+    an archive action.
+    """
+    from subitem_rollup import rollup_subitems
+    rng = random.Random(0)
+    start = datetime.date(2021, 1, 1)
+    results = []
+    for n in sizes:
+        n_projects = max(1, n // 4)
+        projects = [{'pulse_id': 1000000000 + i} for i in range(n_projects)]
+        actions = []
+        subitems = []
+        for i in range(n):
+            created = start + datetime.timedelta(days=rng.randrange(3 * 365))
+            subitem = {'pulse_id': 2000000000 + i, 'parent_id': 1000000000 + rng.randrange(n_projects),
+                       'created_date': created}
+            actions.append(dict(subitem))
+            if rng.random() < 0.8:
+                subitem['archive_date'] = created + datetime.timedelta(days=rng.randrange(60))
+                actions.append({'pulse_id': subitem['pulse_id'], 'parent_id': subitem['parent_id'],
+                                'archive_date': subitem['archive_date']})
+            subitems.append(subitem)
+        row = {'subitems': n, 'projects': n_projects}
+        t0 = time.perf_counter()
+        rollup_subitems([dict(project) for project in projects], actions)
+        row['index_s'] = round(time.perf_counter() - t0, 4)
+        if n <= scan_limit:
+            t0 = time.perf_counter()
+            _rollup_by_scan([dict(project) for project in projects], subitems)
+            row['scan_s'] = round(time.perf_counter() - t0, 4)
+            row['speedup'] = round(row['scan_s'] / row['index_s'], 1) if row['index_s'] else None
+        results.append(row)
+        print(row)
+    return results
+
+def bench_summaries(sizes, delta=1000):
+    """
+    Time applying a sync's worth (delta) of new actions to kept project summaries
+    (see project_summaries.py), against recomputing every summary from all of
+    the actions, and check the two agree. Sizes are numbers of actions.
+    """
+    import project_summaries
+    results = []
+    for n in sizes:
+        actions = make_synthetic_actions(n + delta)[::-1] # Oldest first, so the delta is the newest actions
+        old, new = actions[:-delta], actions[-delta:]
+        row = {'actions': n, 'delta': delta}
+        t0 = time.perf_counter()
+        summaries = project_summaries.ProjectSummaries(old)
+        row['build_s'] = round(time.perf_counter() - t0, 3)
+        t0 = time.perf_counter()
+        touched = summaries.update(new)
+        row['update_s'] = round(time.perf_counter() - t0, 4)
+        row['pulses_touched'] = len(touched)
+        t0 = time.perf_counter()
+        project_summaries.full_recompute(actions)
+        row['recompute_s'] = round(time.perf_counter() - t0, 3)
+        row['speedup'] = round(row['recompute_s'] / row['update_s'], 1) if row['update_s'] else None
+        row['matches'] = not project_summaries.check_consistency(summaries, actions)
+        results.append(row)
+        print(row)
+    return results
+
+# Not activity_schemas, which is only imported where msgspec's typed schemas are wanted, and imports msgspec itself
+IMPORT_MODULES = ['action_index', 'action_record', 'activity_fetcher', 'activity_store',
+                  'activity_stream', 'activity_sync', 'export', 'group_names', 'instrumentation', 'json_backend',
+                  'monday_client', 'monday_dates', 'organize_create_projects', 'organize_creative_proj_subitems',
+                  'organize_events', 'parallel_decode', 'parse_cache', 'pipeline', 'project_summaries',
+                  'pulse_lifecycle', 'query_monday', 'subitem_rollup', 'synthetic_activity']
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'requests', 'flatdict', 'xlsxwriter', 'openpyxl', 'msgspec']
+
+def bench_imports(sizes, modules=IMPORT_MODULES, budget_s=0.1, repeats=3):
+    """
+    Time importing each module in a fresh interpreter (the best of a few runs),
+    and list the heavy third-party modules it pulled in on the way. Importing
+    should be quick and do nothing, so any module over budget_s, or that loads
+    any of HEAVY_MODULES, is marked not ok (and the script exits non-zero).
+    Sizes aren't used.
+    """
+    import os
+    import subprocess
+    check = ('import sys, time; t0 = time.perf_counter(); import {module}; seconds = time.perf_counter() - t0; '
+             'print(seconds, *[name for name in {heavy!r} if name in sys.modules])')
+    results = []
+    for module in modules:
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, '-c', check.format(module=module, heavy=HEAVY_MODULES)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split() # Where the modules are
+            runs.append((float(output[0]), output[1:]))
+        seconds, heavy = min(runs)
+        row = {'module': module, 'import_s': round(seconds, 4), 'heavy': ' '.join(heavy),
+               'ok': seconds <= budget_s and not heavy}
+        results.append(row)
+        print(row)
+    for row in results:
+        if not row['ok']:
+            print(f"Slow import: {row['module']} took {row['import_s']}s, loading {row['heavy'] or 'nothing heavy'}")
+    return results
+
+def _result_key(row):
+    # What identifies a row across runs: every value that isn't a measurement
+    return tuple((key, value) for key, value in row.items()
+                 if not key.endswith(('_s', '_mb', 'per_s', 'speedup', 'matches')) and key not in ('rows', 'ok'))
+
+def record_results(path, benchmark, results):
+    """
+    Save a benchmark's results to a json file, with enough about the run to
+    tell later whether a comparison is fair.
+    """
+    import json
+    import platform
+    import subprocess
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        if commit and subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                     text=True).stdout.strip():
+            commit += '-dirty' # Run with changes that aren't committed, so the commit doesn't say what was run
+    except OSError:
+        commit = None
+    record = {'benchmark': benchmark, 'recorded_at': datetime.datetime.now().isoformat(timespec='seconds'),
+              'commit': commit or None, 'python': platform.python_version(), 'machine': platform.machine(),
+              'results': results}
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=4, default=str)
+
+def compare_results(path, results, threshold=1.2, min_seconds=0.05):
+    """
+    Compare results against ones recorded earlier with record_results, printing
+    the ratio of new to old for every time. Returns the (row, measure, ratio) of
+    each time that got more than threshold times slower, leaving out times too
+    short (under min_seconds both times) to tell from noise.
+    """
+    import json
+    with open(path) as f:
+        recorded = {_result_key(row): row for row in json.load(f)['results']}
+    regressions = []
+    for row in results:
+        old = recorded.get(_result_key(row))
+        if old is None:
+            continue
+        ratios = {key: round(value / old[key], 2) for key, value in row.items()
+                  if key.endswith('_s') and not key.endswith('per_s') and old.get(key) and value is not None}
+        print(dict(_result_key(row)), ratios)
+        regressions.extend((dict(_result_key(row)), key, ratio) for key, ratio in ratios.items()
+                           if ratio > threshold and max(row[key], old[key]) >= min_seconds)
+    for row, key, ratio in regressions:
+        print(f'Slower: {row} {key} took {ratio}x as long')
+    return regressions
+
+BENCHMARKS = {
+    'action_index': bench_action_index,
+    'flatten': bench_flatten,
+    'dates': bench_dates,
+    'merge': bench_merge,
+    'parallel': bench_parallel,
+    'decode': bench_decode,
+    'actions': bench_actions,
+    'parse_cache': bench_parse_cache,
+    'filtered_projects': bench_filtered_projects,
+    'export': bench_export,
+    'end_to_end': bench_end_to_end,
+    'rollup': bench_rollup,
+    'summaries': bench_summaries,
+    'imports': bench_imports,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--record', help='save the results to this json file')
+    parser.add_argument('--compare', help='compare the results with ones saved earlier with --record')
+    args = parser.parse_args()
+    results = BENCHMARKS[args.benchmark](args.sizes)
+    if args.record:
+        record_results(args.record, args.benchmark, results)
+    # Checks a benchmark makes itself: an import that's slow, or two ways of doing something that don't agree
+    failed = [row for row in results if row.get('ok') is False
+              or any(value is False for key, value in row.items() if key.endswith('matches'))]
+    for row in failed:
+        if row.get('ok') is not False:
+            print(f'Results differ: {row}')
+    if args.compare:
+        failed += compare_results(args.compare, results)
+    if failed:
+        sys.exit(1)
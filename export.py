@@ -0,0 +1,183 @@
+"""
+Writes the organizer scripts' tables of one row per project as Excel, csv or
+Parquet, picked by the file extension, instead of df.to_excel(), which builds
+the whole workbook in memory and only ever writes Excel:
+
+- Excel is written a row at a time (xlsxwriter's constant_memory mode if it's
+  installed, otherwise openpyxl's write-only mode), with several sheets in one
+  workbook if given a dict of sheet name to table.
+- csv and Parquet get one file per sheet, named <file>_<sheet>.<ext> when
+  there's more than one.
+
+Before writing, prepare_frame() gives the columns sensible types: dates as
+dates, the type_* flags as booleans, and group/unit ids and names as categories.
+"""
+
+# Python built-in modules
+import csv
+import datetime
+import os
+
+np = pd = None # Imported by _import_pandas() on the first export, so importing this module stays quick
+
+CATEGORY_COLUMNS = ['group_id', 'group_name', 'unit_id', 'unit_name']
+DATE_FORMAT = 'yyyy-mm-dd'
+ROWS_PER_CHUNK = 5000 # Rows converted at a time, which bounds the memory used on top of the DataFrame
+
+
+def _import_pandas():
+    global np, pd
+    if pd is None:
+        import numpy
+        import pandas
+        np, pd = numpy, pandas
+
+def _is_date_column(series):
+    # Only dates (not datetimes, strings or lists), apart from gaps
+    values = series.dropna()
+    return len(values) > 0 and values.map(lambda value: type(value) is datetime.date).all()
+
+def prepare_frame(df):
+    """
+    Copy of df with sensible column types for exporting: columns of dates become
+    datetime64, type_* columns booleans, and CATEGORY_COLUMNS categories. Columns
+    that mix dates with text (like archive_date's "Not archived") are left alone.
+    """
+    _import_pandas()
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if str(column).startswith('type_'):
+            df[column] = series.fillna(False).astype(bool)
+        elif column in CATEGORY_COLUMNS:
+            df[column] = series.astype('category')
+        elif series.dtype == object and _is_date_column(series):
+            df[column] = pd.to_datetime(series)
+    return df
+
+def _cell(value):
+    # A value Excel or csv can hold: None for gaps, text for lists, plain Python scalars
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(_cell(item)) for item in value)
+    if isinstance(value, pd.Timestamp):
+        return value.date() if value == value.normalize() else value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _iter_row_chunks(df, chunk_size=ROWS_PER_CHUNK):
+    # Lists of rows of cell values, converted a column at a time for chunk_size rows at once
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [[_cell(value) for value in chunk[column].tolist()] for column in chunk.columns]
+        yield list(zip(*columns))
+
+def _iter_rows(df):
+    for rows in _iter_row_chunks(df):
+        yield from rows
+
+def _as_sheets(tables):
+    _import_pandas() # _cell() needs it too
+    if isinstance(tables, pd.DataFrame):
+        return {'Sheet1': tables}
+    return dict(tables)
+
+def write_xlsx(tables, path, constant_memory=True):
+    """
+    Write one DataFrame, or a dict of sheet name to DataFrame, to an Excel file,
+    a row at a time. Returns the paths written (just path).
+    """
+    sheets = _as_sheets(tables)
+    try:
+        import xlsxwriter
+    except ImportError: # Falls back on openpyxl
+        xlsxwriter = None
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': constant_memory, 'default_date_format': DATE_FORMAT,
+                                              'remove_timezone': True})
+        bold = workbook.add_format({'bold': True})
+        for name, df in sheets.items():
+            worksheet = workbook.add_worksheet(name[:31]) # Excel's limit on sheet names
+            worksheet.write_row(0, 0, [str(column) for column in df.columns], bold)
+            for row_number, row in enumerate(_iter_rows(df), start=1):
+                worksheet.write_row(row_number, 0, row)
+        workbook.close()
+        return [path]
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        worksheet = workbook.create_sheet(name[:31])
+        worksheet.append([str(column) for column in df.columns])
+        for row in _iter_rows(df):
+            worksheet.append(row)
+    workbook.save(path)
+    return [path]
+
+def _sheet_paths(path, sheets):
+    if len(sheets) == 1:
+        return {name: path for name in sheets}
+    root, ext = os.path.splitext(path)
+    return {name: f'{root}_{name}{ext}' for name in sheets}
+
+def write_csv(tables, path):
+    """
+    Write one DataFrame, or a dict of sheet name to DataFrame (one file each), to csv.
+    Returns the paths written.
+    """
+    sheets = _as_sheets(tables)
+    paths = _sheet_paths(path, sheets)
+    for name, sheet_path in paths.items():
+        df = sheets[name]
+        with open(sheet_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(df.columns)
+            for rows in _iter_row_chunks(df):
+                writer.writerows(rows)
+    return list(paths.values())
+
+def _parquet_ready(df):
+    # Parquet needs one type per column, so columns mixing dates, text and lists become text
+    import pyarrow as pa
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                df[column] = [None if cell is None else str(cell) for cell in map(_cell, df[column].tolist())]
+    return df
+
+def write_parquet(tables, path):
+    """
+    Write one DataFrame, or a dict of sheet name to DataFrame (one file each), to Parquet.
+    Needs pyarrow. Returns the paths written.
+    """
+    sheets = _as_sheets(tables)
+    paths = _sheet_paths(path, sheets)
+    for name, sheet_path in paths.items():
+        _parquet_ready(sheets[name]).to_parquet(sheet_path, index=False)
+    return list(paths.values())
+
+WRITERS = {'.xlsx': write_xlsx, '.csv': write_csv, '.parquet': write_parquet}
+
+def export(tables, path, prepare=True):
+    """
+    Write one DataFrame (or list of row dicts), or a dict of sheet name to either,
+    in the format the file extension of path asks for, after prepare_frame().
+    Returns the paths written: csv and Parquet get a file for each sheet.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError(f"Don't know how to export {ext!r} files; use one of {sorted(WRITERS)}")
+    _import_pandas()
+    if isinstance(tables, (pd.DataFrame, list)):
+        tables = {'Sheet1': tables}
+    sheets = {}
+    for name, table in tables.items():
+        df = table if isinstance(table, pd.DataFrame) else pd.DataFrame(table)
+        sheets[name] = prepare_frame(df) if prepare else df
+    return WRITERS[ext](sheets, path)
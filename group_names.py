@@ -0,0 +1,264 @@
+"""
+Keeps the names of the groups (units) on each board in one cache, keyed by
+board id and group id. Activity logs only carry a group's id, so the
+organizers look up the unit's name for every action, which used to come from a
+hardcoded dict in one script and a json file re-read on every lookup in
+another. Names are loaded a board at a time from a list of sources, tried in
+order: a local snapshot file, the Monday.com API, or the names built in below.
+When a group id isn't in the cache (a new group, or one that was evicted), its
+board is loaded again, at most once every refresh_interval seconds.
+"""
+
+# Python built-in modules
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+snapshot_file = '/Users/douglasray/Projects/monday_actions/data_files/group_names.json'
+board_file = '/Users/douglasray/Projects/monday_actions/data_files/board_id.json' # Saved response to board_query.json
+
+# Groups on the CLAS Communication Projects board, used when nothing else is available
+STATIC_GROUPS = {
+    592284362: {
+        'new_group82157': 'Academic Advising Center', 
+        'new_group64256': 'African American Studies Program', 
+        'topics': 'Advancement', 
+        'new_group31526': 'Anthropology', 
+        'new_group98531': 'Artificial Intelligence Initiatives', 
+        'new_group8972': 'Archie Carr Sea Turtle Research Center', 
+        'new_group34033': 'Astronomy',
+        'new_group12899': 'Beyond120',
+        'new_group4108': 'Biology',
+        'new_group91025': 'Bob Graham Center',
+        'new_group83765': 'Bureau of Economic & Business Research (BEBR)',
+        'new_group93946': 'CLAS Academic Resources', 
+        'new_group37395': 'Center for African Studies',
+        'new_group57361': 'Center for European Studies', 
+        'new_group35372': 'Deans Office', 
+        'new_group83697': 'Internal', 
+        'new_group38741': 'Environmental Design', 
+        'new_group73404': 'Shorstein Center for Jewish Studies', 
+        'new_group65216': 'Chemistry', 
+        'new_group78440': 'CLAS Newsletter - Sent Every Other Wednesday', 
+        'new_group12736': 'Classics Department', 
+        'new_group91513': 'CLAS Student Exchange', 
+        'new_group31476': 'Dial Center', 
+        'new_group70641': 'Department of Gender, Sexuality, and Womens Studies', 
+        'new_group17064': 'Economics', 
+        'new_group29192': 'English', 
+        'new_group21720': 'English Language Institute', 
+        'new_group98860': 'Geography', 
+        'new_group72451': 'Geological Sciences', 
+        'new_group1091': 'History',
+        'new_group53755': 'Humanities Department', 
+        'new_group58014': 'Languages, Literatures, and Cultures', 
+        'new_group7787': 'Linguistics',
+        'mathematics_department': 'Mathematics Department', 
+        'new_group94612': 'Center for Medieval and Early Modern Studies', 
+        'new_group78691': 'Philosophy', 
+        'new_group96707': 'Physics', 
+        'new_group30786': 'Political Science', 
+        'new_group3634': 'Psychology', 
+        'new_group42110': 'Religion', 
+        'new_group68372': 'Shared Services', 
+        'new_group1816': 'Samuel Proctor Oral History Program', 
+        'new_group75729': 'Sociology, Criminology & Law', 
+        'new_group44359': 'Spanish and Portuguese Studies', 
+        'new_group41599': 'Statistics',
+        'new_group26324': 'Sustainability Studies Department', 
+        'new_group90039': 'University Writing Program'
+        },
+    }
+
+
+class StaticLoader:
+    """
+    Group names from a dict of board id to {group_id: name}.
+    """
+
+    def __init__(self, groups_by_board):
+        self.groups_by_board = groups_by_board
+
+    def __call__(self, board_id):
+        return self.groups_by_board.get(int(board_id))
+
+class SnapshotLoader:
+    """
+    Group names from a local json file: either {board_id: {group_id: name}}, as
+    written by save_snapshot(), or a saved Monday.com response to a boards query
+    asking for groups { id title }. A response that doesn't include the board id
+    (like board_query.json) is taken to be for default_board_id. The file is read
+    again only if it changes.
+    """
+
+    def __init__(self, path, default_board_id=None):
+        self.path = path
+        self.default_board_id = default_board_id
+        self._mtime = None
+        self._groups_by_board = {}
+
+    def __call__(self, board_id):
+        if not os.path.exists(self.path):
+            return None
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._groups_by_board = groups_from_json(json.load(f), self.default_board_id)
+            self._mtime = mtime
+        return self._groups_by_board.get(int(board_id))
+
+class ApiLoader:
+    """
+    Group names asked for from Monday.com with a MondayClient (see monday_client.py).
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, board_id):
+        board = self.client.boards_info([board_id], groups=True).get(board_id)
+        if board is None:
+            return None
+        return {group['id']: group['title'] for group in board.get('groups', [])}
+
+def groups_from_json(data, default_board_id=None):
+    """
+    Dict of board id to {group_id: name} from either snapshot format.
+    """
+    if 'data' in data: # A saved API response
+        groups_by_board = {}
+        for key, boards in data['data'].items():
+            for board in boards:
+                board_id = board.get('id', default_board_id)
+                if board_id is not None:
+                    groups_by_board[int(board_id)] = {group['id']: group['title'] for group in board.get('groups', [])}
+        return groups_by_board
+    return {int(board_id): groups for board_id, groups in data.items()}
+
+class GroupNameCache:
+    """
+    LRU cache of group names keyed by (board_id, group_id), filled a board at a
+    time from the loaders, the first one with names for a board winning.
+    """
+
+    def __init__(self, loaders=(), maxsize=10000, refresh_interval=300):
+        self.loaders = list(loaders)
+        self.maxsize = maxsize
+        self.refresh_interval = refresh_interval # Seconds before a miss can reload the same board
+        self._names = OrderedDict() # (board_id, group_id): name, least recently used first
+        self._loaded_at = {} # board_id: time.monotonic() of its last load
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board_id, group_id, default=None):
+        """
+        Name of a group on a board, loading the board's groups if it isn't cached.
+        """
+        key = (int(board_id), group_id)
+        name = self._lookup(key)
+        if name is not None:
+            self.hits += 1
+            return name
+        self.misses += 1
+        if self.refresh(board_id):
+            name = self._lookup(key)
+        return default if name is None else name
+
+    def _lookup(self, key):
+        name = self._names.get(key)
+        if name is not None:
+            self._names.move_to_end(key)
+        return name
+
+    def refresh(self, board_id, force=False):
+        """
+        Load a board's group names again from the first loader that has them.
+        Returns whether anything was loaded. Unless forced, does nothing if the
+        board was loaded less than refresh_interval seconds ago.
+        """
+        board_id = int(board_id)
+        loaded_at = self._loaded_at.get(board_id)
+        if not force and loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+            return False
+        self._loaded_at[board_id] = time.monotonic()
+        for loader in self.loaders:
+            groups = loader(board_id)
+            if groups:
+                self.update(board_id, groups)
+                return True
+        return False
+
+    def update(self, board_id, groups):
+        """
+        Add or replace names for a board's groups, from a dict of group_id to name.
+        """
+        board_id = int(board_id)
+        for group_id, name in groups.items():
+            key = (board_id, group_id)
+            self._names[key] = name
+            self._names.move_to_end(key)
+        while len(self._names) > self.maxsize:
+            self._names.popitem(last=False)
+
+    def board_groups(self, board_id):
+        """
+        Dict of group_id to name for every group of the board currently cached,
+        loading the board first if none are.
+        """
+        board_id = int(board_id)
+        groups = {group_id: name for (cached_board, group_id), name in self._names.items() if cached_board == board_id}
+        if not groups and self.refresh(board_id):
+            return self.board_groups(board_id)
+        return groups
+
+    def for_board(self, board_id):
+        """
+        A read-only dict-like view of one board's group names, for code that
+        used to take a dict of group id to unit name.
+        """
+        return BoardGroups(self, board_id)
+
+    def save_snapshot(self, path, board_ids):
+        """
+        Write the cached names for the given boards to a snapshot file SnapshotLoader can read.
+        """
+        data = {str(board_id): self.board_groups(board_id) for board_id in board_ids}
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(temp_file, path)
+
+class BoardGroups(Mapping):
+    """
+    One board's group names from a GroupNameCache, looked up like a dict of
+    group id to name.
+    """
+
+    def __init__(self, cache, board_id):
+        self.cache = cache
+        self.board_id = int(board_id)
+
+    def get(self, group_id, default=None):
+        return self.cache.get(self.board_id, group_id, default)
+
+    def __getitem__(self, group_id):
+        name = self.cache.get(self.board_id, group_id)
+        if name is None:
+            raise KeyError(group_id)
+        return name
+
+    def __iter__(self):
+        return iter(self.cache.board_groups(self.board_id))
+
+    def __len__(self):
+        return len(self.cache.board_groups(self.board_id))
+
+    def __repr__(self):
+        return f'BoardGroups({self.board_id}, {len(self)} groups)'
+
+# The cache the organizer scripts share. To ask Monday.com for names it doesn't have, add
+# an ApiLoader: group_names.loaders.insert(1, ApiLoader(MondayClient(api_key)))
+group_names = GroupNameCache([SnapshotLoader(snapshot_file), SnapshotLoader(board_file, default_board_id=592284362),
+                              StaticLoader(STATIC_GROUPS)])
@@ -0,0 +1,252 @@
+"""
+Shows where the time goes when a run over the merged logs gets slow: reading
+the json, decoding the data level, flattening or projecting, picking out keys,
+grouping, summarizing or exporting. Each of those is a stage, and while a
+report is being recorded every stage's wall time, number of records and
+throughput are added up, along with (if trace_memory is set) the peak memory
+tracemalloc saw while it ran. The report is written as json, and the whole run
+can be profiled with cProfile at the same time.
+
+Many stages are generators feeding one another, so a stage's time only counts
+the time spent in the stage itself, not in the stages it pulls records from.
+Peak memory is the most allocated at any point while the stage ran, so it
+includes whatever was already held when it started.
+
+With no report being recorded, stage() and iter_stage() hand back a do-nothing
+context and the iterable itself, so leaving them in costs next to nothing.
+"""
+
+# Python built-in modules
+import datetime
+import json
+import time
+from contextlib import contextmanager
+
+_report = None # The StageReport being recorded, if any
+
+
+class StageStats:
+    """
+    What's been recorded for one stage so far.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0 # Not counting time in the stages it pulls from
+        self.records = 0
+        self.calls = 0
+        self.peak_bytes = 0
+
+    def as_dict(self, trace_memory=False):
+        stats = {'stage': self.name, 'seconds': round(self.seconds, 4), 'records': self.records, 'calls': self.calls,
+                 'records_per_s': round(self.records / self.seconds) if self.seconds and self.records else None}
+        if trace_memory:
+            stats['peak_mb'] = round(self.peak_bytes / 1e6, 1)
+        return stats
+
+class StageReport:
+    """
+    Time, records and memory per stage for one run. Stages can nest (a stage
+    can pull records from another), and time in an inner stage is taken off
+    the stage around it.
+    """
+
+    def __init__(self, label=None, trace_memory=False):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.stages = {} # Stage name to StageStats, in the order they first ran
+        self._stack = [] # [StageStats, start time, time in inner stages] for each running stage
+        self.recorded_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return stats
+
+    def _note_peak(self):
+        # Credit the peak since the last stage change to every stage running now
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1]
+        for stats, started, inner in self._stack:
+            if peak > stats.peak_bytes:
+                stats.peak_bytes = peak
+        tracemalloc.reset_peak()
+
+    def _enter(self, stats):
+        if self.trace_memory:
+            self._note_peak()
+        self._stack.append([stats, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        if self.trace_memory:
+            self._note_peak()
+        stats, started, inner = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        stats.seconds += elapsed - inner
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    @contextmanager
+    def stage(self, name):
+        stats = self._stats(name)
+        stats.calls += 1
+        self._enter(stats)
+        try:
+            yield stats
+        finally:
+            self._exit()
+
+    def iter(self, name, iterable):
+        # Time spent getting each item is the stage's; time the consumer spends on it isn't
+        stats = self._stats(name)
+        stats.calls += 1
+        iterator = iter(iterable)
+        while True:
+            self._enter(stats)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            stats.records += 1
+            yield item
+
+    def as_dict(self):
+        finished = self.finished if self.finished is not None else time.perf_counter()
+        total = finished - self.started
+        report = {'label': self.label, 'recorded_at': self.recorded_at, 'total_seconds': round(total, 4),
+                  'unstaged_seconds': round(total - sum(stats.seconds for stats in self.stages.values()), 4),
+                  'trace_memory': self.trace_memory,
+                  'stages': [stats.as_dict(self.trace_memory) for stats in self.stages.values()]}
+        if self.trace_memory:
+            report['peak_mb'] = round(max([stats.peak_bytes for stats in self.stages.values()] + [0]) / 1e6, 1)
+        return report
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=4)
+
+class _NullStage:
+    # Stands in for a stage when nothing's being recorded
+    records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+def stage(name):
+    """
+    Context manager timing a block of code as a stage of the report being
+    recorded. It gives back the stage's StageStats, so the block can add to
+    its records. Does nothing if no report is being recorded.
+    """
+    if _report is None:
+        return _NULL_STAGE
+    return _report.stage(name)
+
+def iter_stage(name, iterable):
+    """
+    Time pulling items from an iterable as a stage, counting each one as a
+    record. Hands back the iterable itself if no report is being recorded.
+    """
+    if _report is None:
+        return iterable
+    return _report.iter(name, iterable)
+
+def staged(name, function, *args, **kwargs):
+    """
+    Call a function as a stage, counting the length of what it returns as
+    its records (if it has one, and isn't a tuple of several results).
+    """
+    if _report is None:
+        return function(*args, **kwargs)
+    with _report.stage(name) as stats:
+        result = function(*args, **kwargs)
+        if hasattr(result, '__len__') and not isinstance(result, tuple):
+            stats.records += len(result)
+    return result
+
+def current_report():
+    """
+    The StageReport being recorded, or None.
+    """
+    return _report
+
+_profiler = None
+_files = (None, None)
+
+def start_recording(report_file=None, profile_file=None, trace_memory=False, label=None):
+    """
+    Start recording a report of the stages that run from here on, to be
+    written as json to report_file by stop_recording(), and if profile_file is
+    set, profile everything with cProfile too. Does nothing if neither file is
+    set. trace_memory turns on tracemalloc, which makes everything run a few
+    times slower, so the times are best taken from a run without it.
+    """
+    global _report, _profiler, _files
+    if report_file is None and profile_file is None:
+        return None
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    _report = StageReport(label, trace_memory)
+    _files = (report_file, profile_file)
+    if profile_file is not None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    return _report
+
+def stop_recording():
+    """
+    Stop recording, writing the report and profile to the files given to
+    start_recording(). Returns the report, or None if nothing was recorded.
+    """
+    global _report, _profiler, _files
+    report = _report
+    if report is None:
+        return None
+    report.finished = time.perf_counter()
+    report_file, profile_file = _files
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(profile_file)
+    if report.trace_memory:
+        import tracemalloc
+        tracemalloc.stop()
+    if report_file is not None:
+        report.write(report_file)
+    _report, _profiler, _files = None, None, (None, None)
+    return report
+
+def stop_recording_in_worker():
+    """
+    Drop a report (and profiler) inherited by a forked worker process,
+    without writing anything.
+    """
+    global _report, _profiler, _files
+    if _profiler is not None:
+        _profiler.disable()
+    if _report is not None and _report.trace_memory:
+        import tracemalloc
+        tracemalloc.stop()
+    _report, _profiler, _files = None, None, (None, None)
+
+@contextmanager
+def recording(report_file=None, profile_file=None, trace_memory=False, label=None):
+    """
+    start_recording() and stop_recording() around a block of code.
+    """
+    report = start_recording(report_file, profile_file, trace_memory, label)
+    try:
+        yield report
+    finally:
+        stop_recording()
@@ -0,0 +1,69 @@
+"""
+Decodes the json string each activity carries in its 'data' field with the
+fastest json library installed. Decoding those strings is most of the work of
+reading a log, and orjson and msgspec both decode json several times faster
+than the json module in the standard library, so if either one is installed
+it's used; otherwise everything falls back on the standard library. Both give
+back the same dicts, lists, strings and numbers that json.loads does.
+
+To pick a backend by hand (e.g. to compare them), call use_backend('json'),
+use_backend('orjson') or use_backend('msgspec'). Nothing is imported until the
+first decode (or use_backend), and then only the backend that gets used.
+"""
+
+# Python built-in modules
+import json
+
+PREFERRED = ['orjson', 'msgspec', 'json'] # Fastest first for small dicts like the data strings
+
+backend = None # Name of the backend in use, picked on the first decode
+_loads = None
+
+
+def _backend_loads(name):
+    # The loads function of a backend, or None if it isn't installed
+    try:
+        if name == 'orjson':
+            import orjson
+            return orjson.loads
+        if name == 'msgspec':
+            import msgspec
+            return msgspec.json.Decoder().decode
+    except ImportError: # Optional, just faster
+        return None
+    if name == 'json':
+        return json.loads
+    raise ValueError(f"Unknown json backend {name!r}; choose from {PREFERRED}")
+
+def available_backends():
+    """
+    Names of the installed backends, fastest first.
+    """
+    return [name for name in PREFERRED if _backend_loads(name) is not None]
+
+def use_backend(name):
+    """
+    Switch every later decode to the named backend, which must be installed.
+    """
+    global backend, _loads
+    backend_loads = _backend_loads(name)
+    if backend_loads is None:
+        raise ImportError(f"json backend {name!r} isn't installed; available: {available_backends()}")
+    backend = name
+    _loads = backend_loads
+
+def current_backend():
+    """
+    Name of the backend in use, picking the fastest installed one if none has been yet.
+    """
+    if backend is None:
+        use_backend(next(name for name in PREFERRED if _backend_loads(name) is not None))
+    return backend
+
+def loads(text):
+    """
+    Decode a json string with the current backend.
+    """
+    if _loads is None:
+        current_backend()
+    return _loads(text)
@@ -0,0 +1,131 @@
+"""
+MondayClient holds one pooled HTTP session for the Monday.com API, so repeated
+queries reuse open connections instead of starting fresh each time, and it can
+ask for several boards in a single GraphQL request by giving each board its own
+alias in the query.
+"""
+
+# Python built-in modules
+import os
+import threading
+
+API_URL = "https://api.monday.com/v2"
+QUERY_LIMIT = 10000 # Monday.com caps activity logs at 10000 per query
+ACTIVITY_FIELDS = 'id event data entity user_id created_at'
+
+
+class MondayAPIError(Exception):
+    """
+    Raised when Monday.com returns errors we can't retry our way out of.
+    """
+
+
+def build_activity_query(board_id, from_date, to_date, limit=QUERY_LIMIT):
+    """
+    GraphQL query for the activity logs of one board between two dates.
+    """
+    return (f'query {{ boards (ids: {board_id}) {{ activity_logs (from: "{from_date}", to: "{to_date}", '
+            f'limit:{limit}) {{ {ACTIVITY_FIELDS} }}}}}}')
+
+def build_batched_boards_query(board_ids, groups=True, from_date=None, to_date=None, limit=QUERY_LIMIT):
+    """
+    One GraphQL query covering many boards, each under its own alias (board_<id>),
+    asking for the board's name and id, optionally its groups, and its activity
+    logs if a date window is given.
+    """
+    fields = 'id name'
+    if groups:
+        fields += ' groups { id title }'
+    if from_date is not None and to_date is not None:
+        fields += f' activity_logs (from: "{from_date}", to: "{to_date}", limit:{limit}) {{ {ACTIVITY_FIELDS} }}'
+    aliases = ' '.join(f'board_{board_id}: boards (ids: {board_id}) {{ {fields} }}' for board_id in board_ids)
+    return f'query {{ {aliases} }}'
+
+class MondayClient:
+    """
+    Shared connection to the Monday.com API. Keeps one requests.Session with a
+    connection pool (keep-alive) and the authorization header already set. The
+    session (and requests itself) is only set up when the first query is sent,
+    so making a client is free.
+    """
+
+    def __init__(self, api_key=None, api_url=API_URL, pool_size=10, timeout=120):
+        if api_key is None:
+            api_key = os.environ.get('MONDAY_API_KEY', '')
+        self.api_url = api_url
+        self.timeout = timeout
+        self.headers = {"Authorization" : api_key}
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock() # activity_fetcher.py sends queries from several threads
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+        return self._session
+
+    def post(self, query):
+        """
+        Send a query and return the raw response.
+        """
+        return self.session.post(url=self.api_url, json={'query' : query}, timeout=self.timeout)
+
+    def query(self, query):
+        """
+        Send a query and return the 'data' part of the result,
+        raising MondayAPIError if Monday.com reports errors.
+        """
+        result = self.post(query).json()
+        if 'errors' in result or 'error_code' in result:
+            raise MondayAPIError('Found an error:\n' + str(result))
+        return result['data']
+
+    def boards(self, limit=100):
+        """
+        Name and id of each board.
+        """
+        return self.query(f'query {{ boards (limit:{limit}) {{ name id }}}}')['boards']
+
+    def boards_info(self, board_ids, groups=True, from_date=None, to_date=None, limit=QUERY_LIMIT):
+        """
+        Name, id, groups and (with a date window) activity logs for many boards,
+        in one request. Returns a dict of board id to that board's dict.
+        """
+        board_ids = list(board_ids)
+        if not board_ids:
+            return {}
+        data = self.query(build_batched_boards_query(board_ids, groups, from_date, to_date, limit))
+        board_info = {}
+        for board_id in board_ids:
+            boards = data.get(f'board_{board_id}') or []
+            if boards:
+                board_info[board_id] = boards[0]
+        return board_info
+
+    def activity(self, board_id, from_date, to_date, limit=QUERY_LIMIT):
+        """
+        Activity logs for one board between two dates.
+        """
+        boards = self.query(build_activity_query(board_id, from_date, to_date, limit))['boards']
+        return boards[0]['activity_logs'] if boards else []
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None: # Nothing to close if no query was ever sent
+                self._session.close()
+                self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
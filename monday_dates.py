@@ -0,0 +1,118 @@
+"""
+Converts Monday.com's timestamps and date strings into datetime dates for the
+organizer scripts. The time of each activity comes as a string of 1e-7 second
+units ('created_at'), and date columns as strings that sometimes carry a time
+part ('2023-03-01T17:18:57.640Z'). The per-row functions convert a single
+value; the others gather a whole column of values into a NumPy array and
+convert them all at once, which is much faster for large activity logs.
+"""
+
+# Python built-in modules
+import datetime
+import re
+from itertools import islice
+
+# NumPy is imported by the column functions that use it, so importing this module stays quick
+
+_SECONDS_PER_DAY = 86400
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ISO_DATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}(?:T.+)?', re.DOTALL) # What string_to_date reads as a date and time part
+
+
+def created_at_to_date(created_at):
+    """
+    Convert one monday.com created_at string to a datetime date, in local time.
+    """
+    return datetime.datetime.fromtimestamp(int(created_at)/10000000).date()
+
+def string_to_date(string_date):
+    """
+    Convert one monday.com date string to a datetime date.
+    """
+    if len(string_date) > 11: # Some of these dates include time as well as date, so trim that
+        string_date = string_date.split("T")[0]
+    return datetime.datetime.strptime(string_date,'%Y-%m-%d').date()
+
+def _offset_at(timestamp):
+    # Local UTC offset in seconds at a unix timestamp
+    local = datetime.datetime.fromtimestamp(int(timestamp)) - _EPOCH
+    return int(local.total_seconds()) - int(timestamp)
+
+def _local_offsets(seconds):
+    # Local UTC offset for each timestamp, looked up once per UTC day, and per
+    # timestamp only on the days the offset changes (daylight saving time)
+    import numpy as np
+    days = seconds // _SECONDS_PER_DAY
+    first = int(days.min())
+    day_starts = np.arange(first, int(days.max()) + 2) * _SECONDS_PER_DAY
+    day_offsets = np.array([_offset_at(t) for t in day_starts], dtype=np.int64)
+    offsets = day_offsets[days - first]
+    changes = (day_offsets[1:] != day_offsets[:-1])[days - first]
+    if changes.any():
+        offsets[changes] = [_offset_at(t) for t in seconds[changes]]
+    return offsets
+
+def created_at_to_dates(values):
+    """
+    Convert a column of created_at strings to a list of datetime dates,
+    matching created_at_to_date for each value.
+    """
+    if len(values) == 0:
+        return []
+    import numpy as np
+    created_at = np.fromiter(map(int, values), dtype=np.int64, count=len(values)) # Faster than parsing a string array
+    seconds = np.floor(created_at / 10000000).astype(np.int64)
+    local_seconds = seconds + _local_offsets(seconds)
+    days = (local_seconds // _SECONDS_PER_DAY).astype('datetime64[D]')
+    return days.astype(object).tolist() # datetime64[D] comes back out as datetime dates
+
+def strings_to_dates(values):
+    """
+    Convert a column of monday.com date strings to a list of datetime dates,
+    dropping any time part. Only a column of zero-padded ISO dates (each
+    maybe followed by 'T' and a time) is converted by NumPy; anything else is
+    converted one at a time by string_to_date, so bad values raise ValueError
+    just as they would there.
+    """
+    if len(values) == 0:
+        return []
+    if not all(isinstance(value, str) and _ISO_DATE.fullmatch(value) for value in values):
+        return [string_to_date(value) for value in values]
+    import numpy as np
+    date_parts = np.asarray(values, dtype='U10') # Every value starts with a 10 character date, so this drops the time part
+    try:
+        days = date_parts.astype('datetime64[D]')
+    except ValueError: # Not a real date, like 2023-02-30
+        return [string_to_date(value) for value in values]
+    return days.astype(object).tolist()
+
+def _convert_column(records, key, convert):
+    # Gather one key from every record that has it, convert them together and put them back
+    rows = [record for record in records if key in record]
+    if rows:
+        for record, converted in zip(rows, convert([record[key] for record in rows])):
+            record[key] = converted
+
+def normalize_dates(records, created_at_keys=(), date_keys=()):
+    """
+    Convert date fields in a list of dicts in place, a column at a time.
+    created_at_keys hold monday.com created_at strings; date_keys hold date strings.
+    Records without a given key are left alone.
+    """
+    for key in created_at_keys:
+        _convert_column(records, key, created_at_to_dates)
+    for key in date_keys:
+        _convert_column(records, key, strings_to_dates)
+    return records
+
+def iter_normalized_dates(records, created_at_keys=(), date_keys=(), chunk_size=50000):
+    """
+    Streaming version of normalize_dates: gathers the records into chunks,
+    converts each chunk's date columns together, and yields the records in order.
+    """
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield from normalize_dates(chunk, created_at_keys, date_keys)
@@ -13,71 +13,72 @@ Douglas Ray.
 # Python built-in modules
 from collections import OrderedDict
 from collections.abc import MutableMapping
-import datetime
-import flatdict
-import json
-import requests
 
-# Imported modules
-import pandas as pd
+# pandas and numpy are imported by the functions that use them, so importing this module stays quick
+
+# Local modules
+from action_index import ActionIndex
+from action_record import Action, iter_compact_actions
+from group_names import group_names
+from instrumentation import iter_stage, staged, start_recording, stop_recording
+from activity_stream import activity_data, iter_activities
+from monday_dates import iter_normalized_dates, normalize_dates
+from parallel_decode import DEFAULT_CHUNK_SIZE, iter_parallel
 
 data_file = '/Users/douglasray/Projects/monday_actions/data_files/creative_projects/2021-23_creative_projects_merged.json'
+board_id = 592284362 # CLAS Communication Projects
+workers = 1 # Set to the number of CPU cores to decode the json file in that many processes
+cache_dir = '/Users/douglasray/Projects/monday_actions/data_files/parse_cache' # Projected actions from earlier runs, see parse_cache.py; None to turn off
+store_root = None # Set to the folder of a Parquet activity store (see activity_store.py) to read from that instead
+report_file = None # Set to a json file to record time, records and memory for each stage, see instrumentation.py
+profile_file = None # Set to a file to profile the run with cProfile as well
+trace_memory = False # Record peak memory for each stage too (slows the run down a few times)
 
-units_dict = {
-    'new_group82157': 'Academic Advising Center', 
-    'new_group64256': 'African American Studies Program', 
-    'topics': 'Advancement', 
-    'new_group31526': 'Anthropology', 
-    'new_group98531': 'Artificial Intelligence Initiatives', 
-    'new_group8972': 'Archie Carr Sea Turtle Research Center', 
-    'new_group34033': 'Astronomy',
-    'new_group12899': 'Beyond120',
-    'new_group4108': 'Biology',
-    'new_group91025': 'Bob Graham Center',
-    'new_group83765': 'Bureau of Economic & Business Research (BEBR)',
-    'new_group93946': 'CLAS Academic Resources', 
-    'new_group37395': 'Center for African Studies',
-    'new_group57361': 'Center for European Studies', 
-    'new_group35372': 'Deans Office', 
-    'new_group83697': 'Internal', 
-    'new_group38741': 'Environmental Design', 
-    'new_group73404': 'Shorstein Center for Jewish Studies', 
-    'new_group65216': 'Chemistry', 
-    'new_group78440': 'CLAS Newsletter - Sent Every Other Wednesday', 
-    'new_group12736': 'Classics Department', 
-    'new_group91513': 'CLAS Student Exchange', 
-    'new_group31476': 'Dial Center', 
-    'new_group70641': 'Department of Gender, Sexuality, and Womens Studies', 
-    'new_group17064': 'Economics', 
-    'new_group29192': 'English', 
-    'new_group21720': 'English Language Institute', 
-    'new_group98860': 'Geography', 
-    'new_group72451': 'Geological Sciences', 
-    'new_group1091': 'History',
-    'new_group53755': 'Humanities Department', 
-    'new_group58014': 'Languages, Literatures, and Cultures', 
-    'new_group7787': 'Linguistics',
-    'mathematics_department': 'Mathematics Department', 
-    'new_group94612': 'Center for Medieval and Early Modern Studies', 
-    'new_group78691': 'Philosophy', 
-    'new_group96707': 'Physics', 
-    'new_group30786': 'Political Science', 
-    'new_group3634': 'Psychology', 
-    'new_group42110': 'Religion', 
-    'new_group68372': 'Shared Services', 
-    'new_group1816': 'Samuel Proctor Oral History Program', 
-    'new_group75729': 'Sociology, Criminology & Law', 
-    'new_group44359': 'Spanish and Portuguese Studies', 
-    'new_group41599': 'Statistics',
-    'new_group26324': 'Sustainability Studies Department', 
-    'new_group90039': 'University Writing Program'
-    }
+units_dict = group_names.for_board(board_id) # Group id to unit name, see group_names.py
+
+def _flatten_into(flat_dict: MutableMapping, nested: MutableMapping, prefix: str, sep: str) -> None:
+    # Adds the leaves of a nested dict to flat_dict under dotted keys
+    for key, value in nested.items():
+        new_key = f'{prefix}{sep}{key}'
+        if isinstance(value, dict):
+            _flatten_into(flat_dict, value, new_key, sep) # Empty dicts add nothing, as in json_normalize
+        else:
+            flat_dict[new_key] = value
 
 def flatten_dict(elem: MutableMapping, sep: str= '.') -> MutableMapping:
-    # Flattens dict of dicts for each action
-    [flat_dict] = pd.json_normalize(elem, sep=sep).to_dict(orient='records')
+    """
+    Flattens dict of dicts for each action into dotted keys like 'data.value.label.text'.
+    Gives the same keys, values and key order as pd.json_normalize(elem).to_dict(orient='records')
+    for a single record, without building a DataFrame for every action.
+    """
+    flat_dict = {key: value for key, value in elem.items() if not isinstance(value, dict)} # Top level first, like json_normalize
+    for key, value in elem.items():
+        if isinstance(value, dict):
+            _flatten_into(flat_dict, value, key, sep)
     return flat_dict
 
+def flatten_dicts(elems, sep: str= '.', batch: bool= False):
+    """
+    Flattens a whole list of actions. By default each action goes through flatten_dict.
+    With batch=True the entire log is normalized in one pd.json_normalize call instead;
+    that needs the whole log in memory, and because every record gets every column,
+    keys whose value is missing or None are dropped from each record afterward.
+    """
+    if not batch:
+        return [flatten_dict(elem, sep) for elem in elems]
+    import pandas as pd
+    df = pd.json_normalize(list(elems), sep=sep).convert_dtypes() # Nullable dtypes keep ints as ints around gaps
+    flat_dicts = []
+    for record in df.to_dict(orient='records'):
+        flat_dicts.append({key: value for key, value in record.items() if not _is_missing(value, pd.NA)})
+    return flat_dicts
+
+def _is_missing(value, na):
+    # None, NaN and pd.NA (passed in as na) all mark a column the record didn't have
+    if value is None or value is na:
+        return True
+    return isinstance(value, float) and value != value
+
 def flatten_list(new_keys_list):
     """ 
     Flattens list of lists of keys, and removes duplicates. 
@@ -86,45 +87,57 @@ def flatten_list(new_keys_list):
     unique_keys_list = list(OrderedDict.fromkeys(all_keys_list))
     return unique_keys_list
 
-def make_activity_list(data_file, units_dict):
+_flat_date_keys = ['data.previous_value.date', 'data.value.date', 'data.previous_value.changed_at']
+
+def iter_activity_dicts(data_file, units_dict, batch=False, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     """
-    Loop through list of dicts for all activity and flatten them.
-    Get keys for all the dicts, and make a list of unique keys.
+    Stream the activities from the json file one at a time and flatten each,
+    so the whole file never has to be held in memory. batch=True instead
+    flattens the whole file at once, see flatten_dicts. With more than one
+    worker, chunks of chunk_size activities are decoded and flattened in that
+    many processes, see parallel_decode.py.
     """
-    # Opening JSON file
-    f = open(data_file)
-    data = json.load(f)
-
-    list_activity_dicts = [] # Will become a list of dicts for each activity on the monday.com board
-    list_activity_keys = [] # Keys from that list that we'll eventually swap out
+    if workers > 1:
+        if batch:
+            raise ValueError("batch=True flattens the whole file at once, so it can't be split across workers")
+        yield from iter_parallel(_flatten_chunk, iter_activities(data_file), units_dict,
+                                 workers=workers, chunk_size=chunk_size)
+        return
     # Drill down a few layers in the json data to expose the dicts of dicts we want to keep
-    for elem in data:
-        data_level = json.loads(elem['data']) # Normalize level that comes as jason string
-        elem['data'] = data_level
-        flat_dict = flatten_dict(elem) # Flatten nested dicts
-        flat_dict['created_at'] = int(flat_dict['created_at'])/10000000 # Several steps to convert unix string to datatime obj
-        flat_dict['created_at'] = datetime.datetime.fromtimestamp(flat_dict['created_at']).date() # Convert to datetime date
-        if 'data.previous_value.date' in flat_dict:  #Several steps to convert string to datetime
-            old_string_date1 = flat_dict['data.previous_value.date']
-            if len(old_string_date1) > 11: # Some of these dates include time as well as date, so trim that
-                old_string_date1 = old_string_date1.split("T")[0]
-            converted_old_date1 = datetime.datetime.strptime(old_string_date1,'%Y-%m-%d').date()
-            flat_dict['data.previous_value.date'] = converted_old_date1
-        if 'data.value.date' in flat_dict:  #Several steps to convert string to datetime
-            old_string_date2 = flat_dict['data.value.date']
-            if len(old_string_date2) > 11: # Some of these dates include time as well as date, so trim that
-                old_string_date2 = old_string_date2.split("T")[0]
-            converted_old_date2 = datetime.datetime.strptime(old_string_date2,'%Y-%m-%d').date()
-            flat_dict['data.value.date'] = converted_old_date2
-        if 'data.previous_value.changed_at' in flat_dict:  #Several steps to convert string to datetime
-            old_string_date3 = flat_dict['data.previous_value.changed_at']
-            if len(old_string_date3) > 11: # Some of these dates include time as well as date, so trim that
-                old_string_date3 = old_string_date3.split("T")[0]
-            converted_old_date3 = datetime.datetime.strptime(old_string_date3,'%Y-%m-%d').date()
-            flat_dict['data.previous_value.changed_at'] = converted_old_date3
+    activities = iter_activities(data_file, decode_data=True) # Normalize level that comes as json string
+    if batch:
+        flat_dicts = iter_stage('flatten_dict', flatten_dicts(activities, batch=True))
+    else:
+        flat_dicts = iter_stage('flatten_dict', (flatten_dict(elem) for elem in activities)) # Flatten nested dicts
+    # Convert unix strings and date strings to datetime dates, a chunk of actions at a time
+    flat_dicts = iter_stage('normalize_dates', iter_normalized_dates(flat_dicts, created_at_keys=['created_at'],
+                                                                      date_keys=_flat_date_keys))
+    for flat_dict in flat_dicts:
         if 'data.group_id' in flat_dict:
             sub = flat_dict['data.group_id']
             flat_dict['data.group_name'] = units_dict.get(sub)
+        yield flat_dict
+
+def _flatten_chunk(activities, units_dict):
+    # Everything iter_activity_dicts does to each activity, for one chunk in a worker process
+    for elem in activities:
+        activity_data(elem)
+    flat_dicts = [flatten_dict(elem) for elem in activities]
+    normalize_dates(flat_dicts, created_at_keys=['created_at'], date_keys=_flat_date_keys)
+    for flat_dict in flat_dicts:
+        if 'data.group_id' in flat_dict:
+            flat_dict['data.group_name'] = units_dict.get(flat_dict['data.group_id'])
+    return flat_dicts
+
+def make_activity_list(data_file, units_dict, batch=False, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Loop through list of dicts for all activity and flatten them.
+    Get keys for all the dicts, and make a list of unique keys.
+    Set workers to spread the decoding over several processes.
+    """
+    list_activity_dicts = [] # Will become a list of dicts for each activity on the monday.com board
+    list_activity_keys = [] # Keys from that list that we'll eventually swap out
+    for flat_dict in iter_activity_dicts(data_file, units_dict, batch, workers, chunk_size):
         elem_keys = list(flat_dict.keys()) # Flatten nested keys
         list_activity_keys.append(elem_keys) # Make list of lists for all the keys
         list_activity_dicts.append(flat_dict) # Make list of dicts for all the activities
@@ -185,45 +198,148 @@ def map_keys():
     
     return key_map, my_keys_list
 
-def checkKey(list_activity_dicts, my_keys_list, key_map):
+def iter_checked_keys(list_activity_dicts, my_keys_list, key_map, compact=False):
     """
-    Initialize and populate a dictionary of all activities for a given board
-    that only includes the key:value pairs we want to keep, and renames keys.
+    Generator version of checkKey: yields each activity dict with only the
+    key:value pairs we want to keep, with the keys renamed. With compact=True,
+    each is an Action (see action_record.py) rather than a dict.
     """
-    new_list = []
+    my_keys = set(my_keys_list) # Set lookups rather than scanning the list for every key
     for dict in list_activity_dicts:
         new_dict = {}
-        for key in dict.keys(): # Check for key in given dict
-            if key in my_keys_list: # If it's there add key:value to new dict
-                new_dict[key] = dict[key]
-        new_dict = {key_map[k]: v for k, v in new_dict.items()} # Swap new keys for old    
-        new_list.append(new_dict) # Add the new dict to a list of dicts
+        for key, value in dict.items(): # Check for key in given dict
+            if key in my_keys: # If it's there add key:value to new dict, under its new name
+                new_dict[key_map[key]] = value
+        yield Action(new_dict) if compact else new_dict
+
+def checkKey(list_activity_dicts, my_keys_list, key_map, compact=False):
+    """
+    Initialize and populate a dictionary of all activities for a given board
+    that only includes the key:value pairs we want to keep, and renames keys.
+    """
+    new_list = list(iter_stage('checkKey', iter_checked_keys(list_activity_dicts, my_keys_list, key_map, compact)))
     
     return new_list
 
+def compile_projection(key_map, sep='.'):
+    """
+    Compile the flat key map into a tree that mirrors the nesting of an activity.
+    Each node maps a key to (new name, child node): the new name is used when the
+    value there isn't a dict, and the child node when it is. Subtrees that no
+    mapped key reaches, like personsAndTeams or chosenValues, aren't in the tree.
+    """
+    projection = {}
+    for old_key, new_key in key_map.items():
+        node = projection
+        *parents, leaf = old_key.split(sep)
+        for part in parents:
+            rename, child = node.get(part, (None, None))
+            if child is None:
+                child = {}
+                node[part] = (rename, child)
+            node = child
+        rename, child = node.get(leaf, (None, None))
+        node[leaf] = (new_key, child)
+    return projection
+
+def _project_into(new_dict, nested, projection):
+    # Copy only the mapped values from a nested dict, renaming as we go
+    for key, value in nested.items():
+        entry = projection.get(key)
+        if entry is None: # Not a key we keep, and nothing below it is either
+            continue
+        new_key, child = entry
+        if isinstance(value, dict):
+            if child:
+                _project_into(new_dict, value, child)
+        elif new_key is not None:
+            new_dict[new_key] = value
+
+def project_dict(elem, projection):
+    """
+    Pull the mapped keys out of a (decoded) activity straight into a dict with
+    the new key names. Gives the same result as checkKey(flatten_dict(elem)),
+    walking keys in the same order so keys mapped to the same name (like
+    'data.pulse_id' and 'data.pulse.id') resolve the same way.
+    """
+    new_dict = {}
+    for key, value in elem.items(): # Top level values first, like flatten_dict
+        if not isinstance(value, dict):
+            entry = projection.get(key)
+            if entry is not None and entry[0] is not None:
+                new_dict[entry[0]] = value
+    for key, value in elem.items():
+        if isinstance(value, dict):
+            entry = projection.get(key)
+            if entry is not None and entry[1]:
+                _project_into(new_dict, value, entry[1])
+    return new_dict
+
+_projected_date_keys = ['prior_value_date', 'new_date', 'date_last_changed']
+
+def iter_projected_actions(data_file, units_dict, projection, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, compact=False):
+    """
+    Stream the activities from the json file and project each one onto the
+    renamed keys we keep, converting dates and adding the group name. Does the
+    same work as iter_activity_dicts followed by iter_checked_keys, without
+    flattening anything we'd throw away. Like iter_activity_dicts, it can
+    spread the work over several worker processes, and like iter_checked_keys
+    it can yield compact Actions instead of dicts.
+    """
+    if workers > 1:
+        return iter_stage('parallel_project', iter_parallel(_project_chunk, iter_activities(data_file), units_dict,
+                                                            projection, compact, workers=workers, chunk_size=chunk_size))
+    return project_activities(iter_activities(data_file, decode_data=True), units_dict, projection, compact)
+
+def project_activities(activities, units_dict, projection, compact=False):
+    """
+    Project activities that have already been read (with their data level decoded)
+    the way iter_projected_actions does for a json file.
+    """
+    new_dicts = _project_activities(activities, units_dict, projection)
+    return iter_stage('compact_actions', iter_compact_actions(new_dicts)) if compact else new_dicts
+
+def _project_activities(activities, units_dict, projection):
+    new_dicts = iter_stage('project_dict', (project_dict(elem, projection) for elem in activities))
+    # Convert unix strings and date strings to datetime dates, a chunk of actions at a time
+    new_dicts = iter_stage('normalize_dates', iter_normalized_dates(new_dicts, created_at_keys=['event_date'],
+                                                                    date_keys=_projected_date_keys))
+    for new_dict in new_dicts:
+        if 'group_id' in new_dict:
+            new_dict['group_name'] = units_dict.get(new_dict['group_id'])
+        yield new_dict
+
+def _project_chunk(activities, units_dict, projection, compact=False):
+    # Everything project_activities does to each activity, for one chunk in a worker process
+    for elem in activities:
+        activity_data(elem)
+    return list(project_activities(activities, units_dict, projection, compact))
+
+def iter_pulses(new_list):
+    """
+    Generator version of check_for_pulses.
+    """
+    for elem in new_list:
+        if 'pulse_id' in elem.keys():
+            yield elem
+
 def check_for_pulses(new_list):
     """
     Selecting for things that involve projects ('pulses'),
     not for creating, renaming or archiving boards.
     """
-    pulse_list = []
-    for elem in new_list:
-        if 'pulse_id' in elem.keys():
-            pulse_list.append(elem)
-        else:
-            continue
+    pulse_list = list(iter_pulses(new_list))
             
     return pulse_list
 
 def create_unique_pulse_id_list(pulse_list):
     """
-    Create a list of unique pulse ids
+    Create a list of unique pulse ids. Takes either the list of pulse actions
+    or an ActionIndex already built from it.
     """
-    pulse_id_list = []
-    for item in pulse_list:
-        pulse_id = item['pulse_id']
-        pulse_id_list.append(pulse_id)
-    unique_pulse_ids = list(dict.fromkeys(pulse_id_list))
+    if not isinstance(pulse_list, ActionIndex):
+        pulse_list = ActionIndex(pulse_list)
+    unique_pulse_ids = pulse_list.pulse_ids()
     
     return unique_pulse_ids
 
@@ -232,15 +348,12 @@ def gather_dicts_by_pulse(unique_pulse_ids, pulse_list):
     Organize the list of dicts for all actions by pulse id,
     creating a list of lists of dictionaries. Each project
     is its own list of dictionaries of related actions.
+    Actions are bucketed by an ActionIndex in a single pass
+    rather than rescanning pulse_list for every pulse id.
     """
-    #project_actions = []
-    gathered_projects = []
-    for pulse_id in unique_pulse_ids: # Loop through all pulse_id values ...
-        project_actions = []
-        for item in pulse_list: # Compare with each item in the list of all projects
-            if item["pulse_id"] == pulse_id: # If it has the pulse_id we're seeking ...
-                project_actions.append(item) # add it a list for that pulse_id
-        gathered_projects.append(project_actions) # And then add that list to a list for all projects
+    if not isinstance(pulse_list, ActionIndex):
+        pulse_list = ActionIndex(pulse_list)
+    gathered_projects = pulse_list.projects(unique_pulse_ids) # List of actions for each pulse_id
         
     return gathered_projects
     
@@ -253,38 +366,30 @@ To evaluate by project type: 'column_name':'Type of Work' + 'new_text': 'Photogr
 
 def get_group_name(id):
     """
-    Gets CLAS unit name based on monday.com group_id
+    Gets CLAS unit name based on monday.com group_id, from the shared
+    cache of group names (see group_names.py)
     """
-    board_file = '/Users/douglasray/Projects/monday_actions/data_files/board_id.json'
-    f = open(board_file)
-    data = json.load(f)
-    group_dicts = data['data']['boards'][0]['groups']
-    for i in group_dicts:
-        if id in i.values():
-            unit_name = i['title']
-    return unit_name
+    return units_dict.get(id)
 
 def flatten(project_types):
     """
     Function for cleaning up work types, that are sometimes listed singularly
     and sometimes several in a single string. Used in build_filtered_projects, below.
     """
-    project_types = [i.split(',') for i in project_types] # Break up strings that contain a comma
-    project_types = [item for row in project_types for item in row] # Gather items into a list of lists
-    # Flatten list of lists of strings
     wt = []
     for i in project_types:
-        if isinstance(i,list): wt.extend(flatten(i))
-        else: wt.append(i)
-    wt = list(set(wt))
-    wt = [x.strip(' ') for x in wt]
+        wt.extend(x.strip(' ') for x in i.split(',')) # Break up strings that contain a comma
+    wt = list(dict.fromkeys(wt)) # Remove duplicates, keeping the order they were added
     return wt
 
 def build_filtered_projects(gathered_projects):
     """
     Takes list of lists of dicts for all pulse projects and builds a simpler list
     of dicts with selected key:value pairs. Maybe the final step.
+    Also takes an ActionIndex, in which case its projects are used directly.
     """
+    if isinstance(gathered_projects, ActionIndex):
+        gathered_projects = gathered_projects.projects()
     filtered_projects = []
     for i in gathered_projects: # loop through projects as items in list of projects
         project_dict = {}
@@ -337,6 +442,155 @@ def build_filtered_projects(gathered_projects):
         filtered_projects.append(project_dict)
     return filtered_projects
 
+# Fields build_filtered_projects reads from each action
+SUMMARY_FIELDS = ['pulse_id', 'event', 'event_date', 'pulse_name', 'group_id', 'group_name', 'column_name',
+                  'new_text', 'new_date']
+_LAST_VALUE_FIELDS = ['pulse_name', 'group_id', 'group_name'] # The last action that has one wins
+
+def actions_frame(actions):
+    """
+    DataFrame of the SUMMARY_FIELDS of a list of actions (dicts or Actions), one
+    row per action in order. Actions also come in as an ActionIndex or as lists of
+    actions per project. A has_<field> column marks the actions that have each
+    field at all, since a field that's there with a value of None still counts.
+    This goes through the actions one at a time in Python, and takes longer than
+    build_filtered_projects over an ActionIndex of them would, so summarizing
+    with a DataFrame only pays off for actions read from the activity store.
+    """
+    import numpy as np
+    import pandas as pd
+    if isinstance(actions, ActionIndex):
+        actions = actions.projects()
+    actions = list(actions)
+    if actions and isinstance(actions[0], list): # Gathered projects
+        actions = [action for project in actions for action in project]
+    columns = {field: [action.get(field) for action in actions] for field in SUMMARY_FIELDS}
+    for field in _LAST_VALUE_FIELDS + ['new_text', 'new_date']:
+        columns[f'has_{field}'] = np.array([field in action for action in actions], dtype=bool)
+    df = pd.DataFrame(columns, dtype=object)
+    # Typed columns: ids as integers, and the handful of events and column names as categories, which
+    # compare quickly. The other fields stay as they are, so values like None and dates come back unchanged
+    return df.astype({'pulse_id': 'Int64', 'event': 'category', 'column_name': 'category',
+                      **{f'has_{field}': bool for field in _LAST_VALUE_FIELDS + ['new_text', 'new_date']}})
+
+def _has(df, field):
+    # Which rows have the field: from its has_ column, or for frames read from the store, where it isn't null
+    if f'has_{field}' in df.columns:
+        return df[f'has_{field}'].to_numpy()
+    return df[field].notna().to_numpy()
+
+_ABSENT = object() # Marks a summary field a project doesn't have
+
+def _summary_column(codes, order, mask, values, n_pulses, empty=_ABSENT, last=False):
+    # One summary value per pulse from the values in the rows in mask: empty where a pulse
+    # has none, otherwise its last value if last is set, else its only value or a list of them.
+    # order is the rows sorted by pulse (stably, so in order within each), shared by every column
+    import numpy as np
+    rows = order[mask[order]] # Grouped by pulse, in order within each
+    counts = np.bincount(codes[rows], minlength=n_pulses)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    column = np.empty(n_pulses, dtype=object)
+    column[:] = [empty] * n_pulses
+    have = counts > 0
+    column[have] = values[rows[(ends - 1 if last else starts)[have]]]
+    column = column.tolist()
+    if not last:
+        values = values[rows].tolist()
+        for code in np.flatnonzero(counts > 1).tolist(): # Only pulses with several values need a list
+            column[code] = values[starts[code]:ends[code]]
+    return column
+
+def build_filtered_projects_frame(actions):
+    """
+    Same summaries as build_filtered_projects, worked out with array operations
+    over a DataFrame of every action instead of looping through the actions of
+    each project. Takes an actions_frame() DataFrame (or one read from the
+    activity store, with its event_date and new_date as dates), or anything
+    actions_frame() takes. Create and archive actions are found by their
+    event, and work types and due dates by their column_name. On synthetic
+    activity (benchmarks.py filtered_projects) this summarizes about 2x as fast
+    as build_filtered_projects, and reading a store into a DataFrame and
+    summarizing it takes a third to a quarter of the time of reading it as
+    dicts and looping.
+    """
+    import numpy as np
+    import pandas as pd
+    df = actions if isinstance(actions, pd.DataFrame) else actions_frame(actions)
+    df = df[df['pulse_id'].notna()]
+    pulse_id = df['pulse_id']
+    if not pd.api.types.is_integer_dtype(pulse_id): # e.g. floats, from a store column with gaps
+        pulse_id = pulse_id.astype('Int64')
+    codes, pulse_ids = pd.factorize(pulse_id, sort=False) # Pulses numbered in the order they first show up
+    n = len(pulse_ids)
+    order = np.argsort(codes, kind='stable') # Sorted once, for every column
+    event = df['event']
+    column_name = df['column_name']
+    event_date = df['event_date'].to_numpy()
+    columns = {
+        'pulse_id': pulse_ids.tolist(),
+        'total_actions': np.bincount(codes, minlength=n).tolist(),
+        'archive_date': _summary_column(codes, order, event.eq('archive_pulse').to_numpy(), event_date, n, "Not archived"),
+        }
+    for field in _LAST_VALUE_FIELDS:
+        if field in df.columns:
+            columns[field] = _summary_column(codes, order, _has(df, field), df[field].to_numpy(), n, last=True)
+    columns['created'] = _summary_column(codes, order, event.eq('create_pulse').to_numpy(), event_date, n, last=True)
+    due_dates = column_name.eq('Internal Due Date').to_numpy() & _has(df, 'new_date')
+    columns['due_date'] = _summary_column(codes, order, due_dates, df['new_date'].to_numpy(), n, "No deadline set")
+    work_types = column_name.eq('Type of Work').to_numpy() & _has(df, 'new_text')
+    project_types = _summary_column(codes, order, work_types, df['new_text'].to_numpy(), n, "undetermined")
+    flattened = {} # The same few combinations of work types come up over and over
+    for code, project_type in enumerate(project_types):
+        if isinstance(project_type, list):
+            key = tuple(project_type)
+            if key not in flattened:
+                flattened[key] = flatten(project_type)
+            project_types[code] = list(flattened[key])
+    columns['project_type'] = project_types
+
+    names = list(columns)
+    filtered_projects = []
+    for values in zip(*columns.values()):
+        filtered_projects.append({name: value for name, value in zip(names, values) if value is not _ABSENT})
+    return filtered_projects
+
+# Work types used on monday.com, and the type_* columns each one sets.
+# "Email Marketing" counts as "Email" too, and "Web (People)" as "Web".
+PROJECT_TYPE_COLUMNS = {
+    "Editorial": ["type_editorial"],
+    "Email": ["type_email"],
+    "Email Marketing": ["type_email_marketing", "type_email"],
+    "Event Promotion": ["type_event"],
+    "Graphic Design": ["type_design"],
+    "News & Pubs": ["type_news"],
+    "Photography": ["type_photo"],
+    "Print Production": ["type_print"],
+    "Social Media Marketing": ["type_social"],
+    "Staff": ["type_staff"],
+    "Videography": ["type_video"],
+    "Web (People)": ["type_web_people", "type_web"],
+    "Web": ["type_web"],
+    }
+TYPE_COLUMNS = ["type_editorial", "type_email", "type_email_marketing", "type_event", "type_design", "type_news",
+                "type_photo", "type_print", "type_social", "type_staff", "type_video", "type_web_people", "type_web"]
+# Matrix of work type (rows) by type_* column (columns), compiled once from the mapping above
+_TYPE_NAMES = list(PROJECT_TYPE_COLUMNS)
+_TYPE_MATRIX = [[column in PROJECT_TYPE_COLUMNS[name] for column in TYPE_COLUMNS] for name in _TYPE_NAMES]
+
+def project_type_flags(project_types):
+    """
+    Multi-hot encoding of the project types of many projects at once. Each project type
+    is a single work type, a comma-separated string of them, or a list of them. Work types
+    are matched whole, so "Email Marketing" doesn't also count as a plain "Email" match by
+    accident. Returns a boolean array with a row per project and a column per TYPE_COLUMNS.
+    """
+    import numpy as np
+    import pandas as pd
+    joined = pd.Series(['|'.join(flatten(t if isinstance(t, list) else [t])) for t in project_types], dtype=object)
+    dummies = joined.str.get_dummies(sep='|').reindex(columns=_TYPE_NAMES, fill_value=0) # One column per work type
+    return (dummies.to_numpy() @ np.array(_TYPE_MATRIX)) > 0
+
 def define_project_types(filtered_projects):
     """
     The values for project types come in as a list if more than one project type is specified,
@@ -344,21 +598,6 @@ def define_project_types(filtered_projects):
     """
 
     filtered_projects2 = []
-    project_types = [  # For reference, not for use
-        "Editorial",
-        "Email",
-        "Email Marketing",
-        "Event Promotion",
-        "Graphic Design",
-        "News & Pubs",
-        "Photography",
-        "Print Production",
-        "Social Media Marketing",
-        "Staff",
-        "Videography",
-        "Web (People)"
-        ]
-
     for elem in filtered_projects:
         if 'created' in elem.keys(): 
             if isinstance(elem['archive_date'], list):
@@ -376,77 +615,22 @@ def define_project_types(filtered_projects):
                 while d > 0:
                     elem[f'delay{d-1}'] = elem['due_date'][d-1]
                     d = d - 1
-                if isinstance(elem['archive_date'], str):
+                if isinstance(elem['archive_date'], (str, list)): # A list if archived more than once but never created
                     pass
                 else:
                     elem['past_due'] = abs(elem[f'delay{d1-1}'] - elem['archive_date']).days
             elif isinstance(elem['due_date'], str):
                 pass
             else:
-                if isinstance(elem['archive_date'], str):
+                if isinstance(elem['archive_date'], (str, list)):
                     pass
                 else:
                     elem['past_due'] = abs(elem['due_date'] - elem['archive_date']).days
-        # Project types separated bools as often there are more than one type per project
-        if "Editorial" in elem["project_type"]:
-                elem["type_editorial"] = True
-        else:
-            elem["type_editorial"] = False
-        if "Email" in elem["project_type"]:
-                elem["type_email"] = True
-        else:
-            elem["type_email"] = False
-        if "Email Marketing" in elem["project_type"]:
-                elem["type_email_marketing"] = True
-        else:
-            elem["type_email_marketing"] = False
-        if elem["type_email_marketing"] == True: # condensing "Email" and "Email Marketing"
-            elem["type_email"] = True
-        #elem.pop(elem["type_email_marketing"]) # Apparently key doesn't exist in all projects?
-        if "Event Promotion" in elem["project_type"]:
-                elem["type_event"] = True
-        else:
-            elem["type_event"] = False
-        if "Graphic Design" in elem["project_type"]:
-                elem["type_design"] = True
-        else:
-            elem["type_design"] = False
-        if "News & Pubs" in elem["project_type"]:
-                elem["type_news"] = True
-        else:
-            elem["type_news"] = False
-        if "Photography" in elem["project_type"]:
-                elem["type_photo"] = True
-        else:
-            elem["type_photo"] = False
-        if "Print Production" in elem["project_type"]:
-                elem["type_print"] = True
-        else:
-            elem["type_print"] = False
-        if "Social Media Marketing" in elem["project_type"]:
-                elem["type_social"] = True
-        else:
-            elem["type_social"] = False
-        if "Staff" in elem["project_type"]:
-                elem["type_staff"] = True
-        else:
-            elem["type_staff"] = False
-        if "Videography" in elem["project_type"]:
-                elem["type_video"] = True
-        else:
-            elem["type_video"] = False
-        if "Web (People)" in elem["project_type"]:
-                elem["type_web_people"] = True
-        else:
-            elem["type_web_people"] = False
-        if "Web" in elem["project_type"]:
-                elem["type_web"] = True
-        else:
-            elem["type_web"] = False
-        if elem["type_web_people"] == True: #condensing "Web (People)" and "Web"
-            elem['web'] = True
-        #elem.pop(elem["type_web_people"]) # Apparently key doesn't exist in all projects?
         filtered_projects2.append(elem)
+    # Project types separated bools as often there are more than one type per project
+    flags = project_type_flags([elem['project_type'] for elem in filtered_projects2])
+    for elem, row in zip(filtered_projects2, flags.tolist()):
+        elem.update(zip(TYPE_COLUMNS, row))
     return filtered_projects2
 
 def build_filtered_df(filtered_projects):
@@ -454,21 +638,52 @@ def build_filtered_df(filtered_projects):
     Make dataframe of dicts for created projects, group them by unit,
     and export an excel file that counts them by unit.
     """
+    import pandas as pd
     #cols = ['pulse_name', 'pulse_id', 'group_name', 'group_id', 'project_type', 'created', 'due_date', 'archive_date', 'total_actions']
     df_filtered = pd.DataFrame(filtered_projects)
     #df_filtered = df_filtered[cols]
     return df_filtered
 
+def summary_sheets(df):
+    """
+    The projects along with counts of them by unit and by project type, as sheets
+    for export.export() to write in one go.
+    """
+    by_unit = df.groupby('group_name', dropna=False).size().rename('projects').reset_index()
+    type_columns = [column for column in TYPE_COLUMNS if column in df.columns]
+    by_type = df[type_columns].fillna(False).astype(bool).sum().rename('projects').rename_axis('project_type').reset_index()
+    return {'projects': df, 'by_unit': by_unit, 'by_type': by_type}
+
 if __name__ == "__main__":
+    start_recording(report_file, profile_file, trace_memory, label='organize_create_projects') # Does nothing unless a file is set
     # Run all these things
-    list_activity_keys, list_activity_dicts = make_activity_list(data_file, units_dict) # Create list of dicts for all activity, mostly pulses; and their keys
-    unique_keys_list = flatten_list(list_activity_keys) # Make single list of all the unique keys
-    key_map, my_keys_list = map_keys() # key_map is a dict of original keys with values for new key names; the list is of the old key names
-    new_list = checkKey(list_activity_dicts, my_keys_list, key_map) # Filter the list of dicts for values we want to keep and rename keys
-    pulse_list = check_for_pulses(new_list) # Filter the list of dicts to remove actions, like renaming a board, that isn't really a project
-    unique_pulse_ids = create_unique_pulse_id_list(pulse_list) # Make a list of the pulse id numbers
-    gathered_projects = gather_dicts_by_pulse(unique_pulse_ids, pulse_list) # Organize the actions by project, so a list of lists of dicts
-    filtered_projects = build_filtered_projects(gathered_projects)
-    filtered_projects2 = define_project_types(filtered_projects)
-    df = build_filtered_df(filtered_projects2)
-    #df.to_excel("creative_projects.xlsx") ### UNCOMMENT IF YOU WANT TO GENERATE THE FILE ###
+    # Each step below is a generator, so actions stream from the json file straight into the index
+    if store_root:
+        # Read only the columns the summaries use, for just this board, as a DataFrame, and summarize
+        # the projects with array operations over its columns, without making a dict for each action
+        from activity_store import read_actions
+        columns = ['created_at', 'event', 'event_date', 'pulse_id', 'pulse_name', 'group_id', 'group_name',
+                   'column_name', 'new_text', 'new_date']
+        actions = staged('read_actions', lambda: read_actions(store_root, columns=columns, board_ids=[board_id]).to_pandas())
+        filtered_projects = staged('build_filtered_projects_frame', build_filtered_projects_frame, actions)
+    else:
+        if cache_dir:
+            # Reuse the actions from the last run if the json file hasn't changed. They're
+            # kept as dicts here: loading is several times faster than rebuilding Actions
+            from parse_cache import cached_projected_actions
+            key_map, my_keys_list = map_keys()
+            new_list = staged('cached_projected_actions', cached_projected_actions, data_file, units_dict, key_map,
+                              cache_dir, workers=workers)
+        else:
+            key_map, my_keys_list = map_keys() # key_map is a dict of original keys with values for new key names; the list is of the old key names
+            projection = compile_projection(key_map) # Tree of just the keys we keep, so nothing else gets flattened
+            new_list = iter_projected_actions(data_file, units_dict, projection, workers, compact=True) # Dicts for all activity with only the values we want to keep, keys renamed
+        pulse_list = iter_stage('iter_pulses', iter_pulses(new_list)) # Filter the dicts to remove actions, like renaming a board, that isn't really a project
+        action_index = staged('action_index', ActionIndex, pulse_list) # Bucket the actions by pulse, group, event and date in one pass
+        unique_pulse_ids = staged('create_unique_pulse_id_list', create_unique_pulse_id_list, action_index) # Make a list of the pulse id numbers
+        gathered_projects = staged('gather_dicts_by_pulse', gather_dicts_by_pulse, unique_pulse_ids, action_index) # Organize the actions by project, so a list of lists of dicts
+        filtered_projects = staged('build_filtered_projects', build_filtered_projects, gathered_projects)
+    filtered_projects2 = staged('define_project_types', define_project_types, filtered_projects)
+    df = staged('build_filtered_df', build_filtered_df, filtered_projects2)
+    #from export import export; staged('export', export, summary_sheets(df), "creative_projects.xlsx") ### UNCOMMENT IF YOU WANT TO GENERATE THE FILE (.csv or .parquet work too) ###
+    stop_recording()
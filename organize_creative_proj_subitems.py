@@ -1,44 +1,41 @@
 # import the modules
-import datetime
-import json
-import pandas as pd
+from activity_stream import activity_data, iter_activities
+from group_names import group_names
+from instrumentation import iter_stage, staged, start_recording, stop_recording
+from monday_dates import iter_normalized_dates
+from pulse_lifecycle import pair_created_with_archived
  
 #access file of json data
 dir_path = r'/Users/douglasray/Projects/monday_actions/'
 json_data = 'data_files/creative_projects/2023_creative_projects_subitems_merged.json'
 data_file = dir_path + json_data
+report_file = None # Set to a json file to record time, records and memory for each stage, see instrumentation.py
+profile_file = None # Set to a file to profile the run with cProfile as well
+trace_memory = False # Record peak memory for each stage too (slows the run down a few times)
 
-def build_lists(data_file):
+def iter_subitem_actions(data):
     """
-    Build several lists: 
-    action_dict_list is a list of each action
-    created_events is a list of actions where pulse is created
-    archved_events is a list of actions were pulse is archived
-    pulse_ids is a list of unique pulse_id values for all actions
+    Stream a dictionary for each subitem action, with a few fields from its
+    data level and its dates converted.
     """
-    
-    #read json data
-    with open(data_file) as json_file:
-        data = json.load(json_file)
-    
-    action_dict_list = [] # Build list of dictionaries for each action
-    created_events = [] # Separate list for actions where pulse is created
-    archived_events = [] # Separate list for actions were pulse is archived
-    pulse_ids = [] # Build list of the pulse_id values
-
+    # Convert the unix strings to datetime dates a column (chunk of actions) at a time
+    return iter_stage('normalize_dates', iter_normalized_dates(iter_stage('subitem_actions', _iter_subitem_action_dicts(data)),
+                                                               created_at_keys=['action_date', 'created_date', 'archive_date']))
 
+def _iter_subitem_action_dicts(data):
     for item in data:
         item_dict = {} # Build dictionary for each action
         item_dict['event'] = item['event']
-        item['created_at'] = int(item['created_at'])/10000000 # Several steps to convert unix string to datatime obj
-        item['created_at'] = datetime.datetime.fromtimestamp(item['created_at']).date() # Convert to datetime date
-        item_dict['action_date'] = item['created_at']
-        data_level = json.loads(item['data']) # Normalize level that comes as jason string
-        item['data'] = data_level
+        item_dict['action_date'] = item['created_at'] # Unix string, converted to a date by iter_subitem_actions
+        data_level = activity_data(item) # Normalize level that comes as json string
         if 'create_pulse' in item.values():
             item_dict['created_date'] = item['created_at']
         if 'group_id' in data_level.keys():
             item_dict['unit_id'] = data_level['group_id']
+            if 'board_id' in data_level.keys():
+                unit_name = group_names.get(data_level['board_id'], data_level['group_id']) # Cached, see group_names.py
+                if unit_name is not None:
+                    item_dict['unit_name'] = unit_name
         if 'pulse_id' in data_level.keys():
             item_dict['pulse_id'] = data_level['pulse_id']
         if 'pulse_name' in data_level.keys():
@@ -49,40 +46,53 @@ def build_lists(data_file):
             item_dict['item_name'] = data_level['item_name']
         if 'archive_pulse' in item.values():
             item_dict['archive_date'] = item['created_at']
-        action_dict_list. append(item_dict) # return
+        yield item_dict
+
+def group_subitem_actions(actions):
+    """
+    Sort the subitem action dicts into the lists build_lists returns.
+    """
+    action_dict_list = [] # Build list of dictionaries for each action
+    created_events = [] # Separate list for actions where pulse is created
+    archived_events = [] # Separate list for actions were pulse is archived
+    pulse_ids = [] # Build list of the pulse_id values
+    for item_dict in actions:
+        action_dict_list.append(item_dict)
         if 'created_date' in item_dict.keys():
-            created_events.append(item_dict) # return
+            created_events.append(item_dict)
         if 'archive_date' in item_dict.keys():
-            archived_events.append(item_dict) # return
-    for item in action_dict_list:
-        if 'pulse_id' in item.keys():
-            pulse_ids.append(item['pulse_id'])
-    pulse_ids = list(set(pulse_ids)) # removed duplicates; return
+            archived_events.append(item_dict)
+        if 'pulse_id' in item_dict.keys():
+            pulse_ids.append(item_dict['pulse_id'])
+    pulse_ids = list(set(pulse_ids)) # removed duplicates
     return action_dict_list, created_events, archived_events, pulse_ids
 
-def merge_created_with_archived(created_events, archived_events, pulse_id):
-    new_dict = {}
-    for item in created_events:
-        if item['pulse_id'] == pulse_id:
-            new_dict['pulse_id'] = pulse_id
-            new_dict['pulse_name'] = item['pulse_name']
-            new_dict['unit_id'] = item['unit_id']
-            new_dict['created_date'] = item['created_date']
-            if 'parent_id' in item.keys():
-                new_dict['parent_id'] = item['parent_id']
-        if 'item_name' in item.keys():
-            new_dict['item_name'] = item['item_name']
-    for elem in archived_events:
-        if elem['pulse_id'] == pulse_id:
-            if 'archive_date' in elem.keys():
-                new_dict['archive_date'] = elem['archive_date']
-    return new_dict
+def build_lists(data_file):
+    """
+    Build several lists: 
+    action_dict_list is a list of each action
+    created_events is a list of actions where pulse is created
+    archved_events is a list of actions were pulse is archived
+    pulse_ids is a list of unique pulse_id values for all actions
+    """
+    #read json data one action at a time
+    data = iter_activities(data_file)
+    return staged('group_subitem_actions', group_subitem_actions, iter_subitem_actions(data))
+
+subitem_fields = ['pulse_name', 'unit_id', 'unit_name', 'created_date', 'parent_id'] # Kept from each subitem's create action
+
+def consolidate_subitems(created_events, archived_events, pulse_ids):
+    """
+    Merge the created and archived dicts by pulse_id into a single dict per subitem.
+    """
+    return pair_created_with_archived(created_events, archived_events, pulse_ids, subitem_fields)
 
 if __name__ == "__main__":
+    import pandas as pd
+    from export import export
+    start_recording(report_file, profile_file, trace_memory, label='organize_creative_proj_subitems') # Does nothing unless a file is set
     action_dict_list, created_events, archived_events, pulse_ids = build_lists(data_file)
-    action_dicts = []
-    for pulse_id in pulse_ids:
-        new_dict = merge_created_with_archived(created_events, archived_events, pulse_id)
-        action_dicts.append(new_dict)
-    df = pd.DataFrame(action_dicts)
-    df.to_excel('creative_projects_subitems.xlsx')
\ No newline at end of file
+    action_dicts = staged('consolidate_subitems', consolidate_subitems, created_events, archived_events, pulse_ids)
+    df = staged('dataframe', pd.DataFrame, action_dicts)
+    staged('export', export, df, 'creative_projects_subitems.xlsx')
+    stop_recording()
\ No newline at end of file
@@ -1,46 +1,51 @@
-# Python built-in modules
-from collections import OrderedDict
-from collections.abc import MutableMapping
-import datetime
-import json
-
-# Imported modules
-import pandas as pd
+# Local modules
+from activity_stream import activity_data, iter_activities
+from group_names import group_names
+from instrumentation import iter_stage, staged, start_recording, stop_recording
+from monday_dates import iter_normalized_dates
+from pulse_lifecycle import latest_archives, pair_created_with_archived
 
 """
 Work toward taking a json file of all activities related to an event posting, clean that up and gather
 these by event project (pulse).
 """
 
-# Opening JSON file
+# Stream the JSON file one activity at a time rather than loading it whole
 data_file = '/Users/douglasray/Projects/monday_actions/data_files/events/2021-23_events_merged.json'
-f = open(data_file)
-data = json.load(f)
+report_file = None # Set to a json file to record time, records and memory for each stage, see instrumentation.py
+profile_file = None # Set to a file to profile the run with cProfile as well
+trace_memory = False # Record peak memory for each stage too (slows the run down a few times)
 
-def build_pulse_events_list(data):
+def iter_pulse_actions(data):
     """
-    Use the json data to create list of dicts for each event action
-    and clean this up a bit to select only a few fields and put them
-    on the same level of a given event dict. This also selects only those
-    for 'pulses', which are event postings rather actions like renaming boards.
+    Stream a dict for each event action that involves a 'pulse' (an event posting
+    rather than actions like renaming boards), with only a few fields from the data
+    put on the same level, and its dates converted.
     """
-    
-    # Create a list of dicts for each action if it involves a 'pulse'
+    pulse_dicts = iter_stage('pulse_actions', _iter_pulse_action_dicts(data))
+    # Convert the unix strings to datetime dates a column (chunk of actions) at a time
+    return iter_stage('normalize_dates', iter_normalized_dates(pulse_dicts, created_at_keys=['action_date', 'created_date',
+                                                                                             'archive_date']))
+
+def _iter_pulse_action_dicts(data):
+    # Create a dict for each action if it involves a 'pulse'
     # with the dicts using only certain key:value pairs from the data.
-    pulse_dict_list = [] # This becomes the list of event action dicts
     for item in data:
         action_dict = {}
         if 'pulse' in item['entity']:
             action_dict['action_id'] = item['id']
             action_dict['event'] = item['event']
-            action_dict['action_date'] = int(item['created_at'])/10000000 # Several steps to convert unix string to datatime obj
-            action_dict['action_date'] = datetime.datetime.fromtimestamp(action_dict['action_date']).date() # Convert to datetime date
-            data_level = json.loads(item['data'])
+            action_dict['action_date'] = item['created_at'] # Unix string, converted to a date by iter_pulse_actions
+            data_level = activity_data(item) # Only decode the data string for pulses
             action_dict['data'] = data_level
             if 'group_id' in data_level.keys():
                 action_dict['unit_id'] = data_level['group_id']
             if 'group_name' in data_level.keys():
                 action_dict['unit_name'] = data_level['group_name']
+            elif 'group_id' in data_level.keys() and 'board_id' in data_level.keys():
+                unit_name = group_names.get(data_level['board_id'], data_level['group_id']) # Cached, see group_names.py
+                if unit_name is not None:
+                    action_dict['unit_name'] = unit_name
             if 'pulse_name' in data_level.keys():
                 action_dict['pulse_name'] = data_level['pulse_name']
             if 'create_pulse' in action_dict.values():
@@ -50,19 +55,19 @@ def build_pulse_events_list(data):
             action_dict.pop('data')
             if 'pulse_id' in data_level.keys():
                 action_dict['pulse_id'] = data_level['pulse_id']
-                pulse_dict_list.append(action_dict) # Only add the ones with a pulse ID
-            else:
-                pass
+                yield action_dict # Only add the ones with a pulse ID
 
-    # Gather events where the action was to 'create_pulse' into a list of dictionaries
+def group_pulse_events(pulse_dict_list):
+    """
+    Split the event action dicts into created and archived events,
+    along with the pulse_ids of the archived events.
+    """
+    # Gather events where the action was to 'create_pulse' or 'archive_pulse' into lists of dictionaries
     created_events = [] # This becomes a list of created pulses
+    archived_events = [] # This becomes a list of archived pulses
     for item in pulse_dict_list:
         if 'create_pulse' in item.values():
             created_events.append(item)
-
-    # Gather events where the action was to 'archive_pulse' into a list of dictionaries.
-    archived_events = [] # This becomes a list of archived pulses
-    for item in pulse_dict_list:
         if 'archive_pulse' in item.values():
             archived_events.append(item)
 
@@ -70,10 +75,19 @@ def build_pulse_events_list(data):
     archived_event_ids = []
     for item in archived_events:
         archived_event_ids.append(item['pulse_id'])
-        archived_event_ids = list(set(archived_event_ids)) # remove duplicates
+    archived_event_ids = list(set(archived_event_ids)) # remove duplicates
 
     return created_events, archived_events, archived_event_ids
 
+def build_pulse_events_list(data):
+    """
+    Use the json data to create list of dicts for each event action
+    and clean this up a bit to select only a few fields and put them
+    on the same level of a given event dict. This also selects only those
+    for 'pulses', which are event postings rather actions like renaming boards.
+    """
+    return staged('group_pulse_events', group_pulse_events, iter_pulse_actions(data))
+
 """
 Separating created events from archived events lists because while events are created once,
 they often are archived more than once. So first we'll filter list of archived events to keep
@@ -81,48 +95,29 @@ only the last one for each pulse, then merge created with archived actions per p
 for each pulse.
 """
 
-created_events, archived_events, archived_event_ids = build_pulse_events_list(data)
-
-def consolidate_pulses(archived_events, pulse_id):
+def consolidate_archived_events(archived_events):
     """
-    Make a list of all archive actions for given pulse_id
-    but then just return dict with the last date archived
+    Gather dicts for each archived pulse into a list, keeping only the last
+    archive action for each, in one pass over the archive actions.
     """
-    pulse_dicts = [] # A list for each pulse_id
-    for item in archived_events: 
-        if item['pulse_id'] == pulse_id:
-            pulse_dicts.append(item)
-    last_archive = max(pulse_dicts, key=lambda x: x['archive_date']) # Sort for latest date
-    return last_archive
+    return list(latest_archives(archived_events).values())
 
-# Gather dicts each archived pulse into a list
-consolidated_archived_events = []
-for pulse_id in archived_event_ids:
-    last_archive = consolidate_pulses(archived_events, pulse_id)
-    consolidated_archived_events.append(last_archive)
+event_fields = ['pulse_name', 'unit_id', 'unit_name', 'created_date'] # Kept from each pulse's create action
 
-# Next: merge the created and archived dicts by pulse_id into a single dict per pulse
-def merge_created_with_archived(created_events, consolidated_archived_events, pulse_id):
-    new_dict = {}
-    for item in created_events:
-        if item['pulse_id'] == pulse_id:
-            new_dict['pulse_id'] = pulse_id
-            new_dict['pulse_name'] = item['pulse_name']
-            new_dict['unit_id'] = item['unit_id']
-            if 'unit_name' in item.keys():
-                new_dict['unit_name'] = item['unit_name']
-            new_dict['created_date'] = item['created_date']
-    for elem in consolidated_archived_events:
-        if elem['pulse_id'] == pulse_id:
-            if 'archive_date' in elem.keys():
-                new_dict['archive_date'] = elem['archive_date']
-    return new_dict
+def consolidate_events(created_events, archived_events, archived_event_ids):
+    """
+    Merge the created and archived dicts by pulse_id into a single dict per archived pulse.
+    """
+    return pair_created_with_archived(created_events, archived_events, archived_event_ids, event_fields)
 
 if __name__ == "__main__":
+    import pandas as pd
+    from export import export
+    start_recording(report_file, profile_file, trace_memory, label='organize_events') # Does nothing unless a file is set
+    created_events, archived_events, archived_event_ids = build_pulse_events_list(iter_activities(data_file))
     # This becomes our finished data set.
-    consolidated_event_dicts = []
-    for pulse_id in archived_event_ids:
-        new_dict = merge_created_with_archived(created_events, consolidated_archived_events, pulse_id)
-        consolidated_event_dicts.append(new_dict)
-    df = pd.DataFrame(consolidated_event_dicts)
-    df.to_excel('event_actions.xlsx')
+    consolidated_event_dicts = staged('consolidate_events', consolidate_events, created_events, archived_events,
+                                      archived_event_ids)
+    df = staged('dataframe', pd.DataFrame, consolidated_event_dicts)
+    staged('export', export, df, 'event_actions.xlsx')
+    stop_recording()
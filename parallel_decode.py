@@ -0,0 +1,65 @@
+"""
+Decodes, flattens and projects activities in a pool of worker processes: the
+stream of activities is split into chunks, and the results come back in the
+original order. Decoding each activity's data string, flattening it,
+converting its dates and picking out the keys we keep is the same work for
+every activity, and none of it depends on any other activity, so for
+multi-year logs there's no need to do it all on one core.
+
+The function run on each chunk has to be defined at the top level of a module
+(not a lambda or nested function) so the worker processes can import it.
+"""
+
+# Python built-in modules
+import os
+from collections import deque
+from itertools import islice
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _stop_recording_in_worker():
+    # A forked worker inherits any report being recorded; its stages would only be lost with it
+    import instrumentation
+    instrumentation.stop_recording_in_worker()
+
+def default_workers():
+    """
+    Number of worker processes to use when none is given: one per CPU core.
+    """
+    return os.cpu_count() or 1
+
+def iter_chunks(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split any iterable into lists of up to chunk_size items.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_parallel(chunk_function, items, *args, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield chunk_function(chunk, *args) for each chunk of items, run in a pool
+    of worker processes, in the same order as the items. chunk_function should
+    return a list. Only a few chunks per worker are read ahead, so a long stream
+    of items is never held in memory all at once. With one worker, the chunks
+    are run in this process instead.
+    """
+    if workers is None:
+        workers = default_workers()
+    if workers <= 1:
+        for chunk in iter_chunks(items, chunk_size):
+            yield from chunk_function(chunk, *args)
+        return
+    from concurrent.futures import ProcessPoolExecutor # Only needed with more than one worker
+    with ProcessPoolExecutor(max_workers=workers, initializer=_stop_recording_in_worker) as executor:
+        pending = deque() # Futures for chunks in flight, oldest first
+        for chunk in iter_chunks(items, chunk_size):
+            pending.append(executor.submit(chunk_function, chunk, *args))
+            if len(pending) >= 2 * workers: # Keep every worker busy without reading too far ahead
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,122 @@
+"""
+Keeps the projected actions of a board's merged json file on disk, keyed by a
+hash of the file's contents and of the key map and group names used to
+project it, so a re-run that only changes what happens afterward (like
+build_filtered_projects or define_project_types) just loads them back.
+Decoding and projecting the file is by far the slowest part of
+organize_create_projects.py, yet it gives the same actions every run unless
+the file changed. (A Parquet activity store, see activity_store.py, is read
+straight into a DataFrame instead, which needs no cache.) When the file
+changes, its old pickle is deleted once the new one is written (latest.json
+keeps track).
+
+Cache files are pickles, so only point cache_dir at a folder you trust.
+"""
+
+# Python built-in modules
+import hashlib
+import json
+import os
+import pickle
+
+CACHE_VERSION = 1 # Bump when the shape of the cached actions changes
+_BLOCK_SIZE = 1 << 20
+
+
+def file_digest(path, cache_dir=None):
+    """
+    SHA-256 of a file's contents. With a cache_dir, digests are remembered by
+    path, size and modification time so an unchanged file isn't read again.
+    """
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    index_file = os.path.join(cache_dir, 'digests.json') if cache_dir else None
+    index = {}
+    if index_file and os.path.exists(index_file):
+        with open(index_file) as f:
+            index = json.load(f)
+        entry = index.get(os.path.abspath(path))
+        if entry and entry['stamp'] == stamp:
+            return entry['digest']
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+    if index_file:
+        index[os.path.abspath(path)] = {'stamp': stamp, 'digest': digest}
+        _write_atomic(index_file, json.dumps(index, indent=4).encode())
+    return digest
+
+def settings_digest(*settings):
+    """
+    Hash of anything that changes the projected actions besides the input
+    itself, like the key map and the group names. Settings must be json-able.
+    """
+    text = json.dumps([CACHE_VERSION, *settings], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file, path) # A half-written cache file is never picked up
+
+def load_cached(cache_dir, key):
+    """
+    The actions cached under key, or None if there aren't any.
+    """
+    path = os.path.join(cache_dir, f'{key}.pickle')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def save_cached(cache_dir, key, actions, source=None):
+    """
+    Cache a list of action dicts under key. With a source (the json file the
+    actions were read from), the key is remembered as that source's latest,
+    and the pickle cached for it before is deleted, so a file that changes every
+    day doesn't leave a full pickle behind every day.
+    """
+    _write_atomic(os.path.join(cache_dir, f'{key}.pickle'), pickle.dumps(actions, protocol=pickle.HIGHEST_PROTOCOL))
+    if source is not None:
+        _replace_latest(cache_dir, source, key)
+
+def _replace_latest(cache_dir, source, key):
+    # Record key as the source's latest in latest.json, deleting the pickle it replaces
+    index_file = os.path.join(cache_dir, 'latest.json')
+    index = {}
+    if os.path.exists(index_file):
+        with open(index_file) as f:
+            index = json.load(f)
+    old_key = index.get(source)
+    index[source] = key
+    _write_atomic(index_file, json.dumps(index, indent=4).encode())
+    if old_key is not None and old_key != key and old_key not in index.values(): # Not still another source's latest
+        old_file = os.path.join(cache_dir, f'{old_key}.pickle')
+        if os.path.exists(old_file):
+            os.remove(old_file)
+
+def _compact(actions, compact):
+    if not compact:
+        return actions
+    from action_record import Action
+    return [Action(action) for action in actions]
+
+def cached_projected_actions(data_file, units_dict, key_map, cache_dir, compact=False, **options):
+    """
+    The projected actions for a json file, as iter_projected_actions gives them,
+    from the cache if the file, key map and group names are the same as last
+    time; otherwise projected and cached for next time. Other options are passed
+    on to iter_projected_actions (e.g. workers).
+    """
+    from organize_create_projects import compile_projection, iter_projected_actions
+    key = settings_digest('json', file_digest(data_file, cache_dir), key_map, dict(units_dict))
+    actions = load_cached(cache_dir, key)
+    if actions is None:
+        projection = compile_projection(key_map)
+        actions = list(iter_projected_actions(data_file, units_dict, projection, **options))
+        save_cached(cache_dir, key, actions, source=os.path.abspath(data_file))
+    return _compact(actions, compact)
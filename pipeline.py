@@ -0,0 +1,215 @@
+"""
+Runs the organizers for creative projects, events and subitems as the same
+series of stages. Each one reads a board's merged json file of activity and
+boils it down to one row per pulse, and here each does it the same way:
+
+    ingest -> decode -> project -> group -> aggregate -> export
+
+Reading and decoding the json file, and writing the result, are shared by every
+board. A board's profile supplies the rest: which fields to project out of each
+action, how to group the actions, and how to boil each group down to a row.
+
+Run one or more boards from the command line, e.g.:
+
+    python pipeline.py events creative_projects
+    python pipeline.py subitems --data-file subitems.json --output subitems.csv
+    python pipeline.py creative_projects --output creative_projects.parquet
+    python pipeline.py events --report events_report.json --trace-memory
+    python pipeline.py project_effort
+
+--report records the time, records and peak memory of each stage (see
+instrumentation.py), and --profile profiles the run with cProfile.
+"""
+
+# Python built-in modules
+import argparse
+import os
+
+# Local modules
+import organize_create_projects
+import organize_creative_proj_subitems
+import organize_events
+from export import export
+from action_index import ActionIndex
+from activity_stream import activity_data, iter_activities
+from instrumentation import iter_stage, recording, staged
+from subitem_rollup import rollup_subitems
+
+STAGES = ['ingest', 'decode', 'project', 'group', 'aggregate', 'export']
+
+
+def ingest_activities(data_file):
+    """
+    Shared ingest stage: stream the activities from a board's merged json file.
+    """
+    return iter_activities(data_file)
+
+def decode_activities(activities, entity=None):
+    """
+    Shared decode stage: decode each activity's data level. With entity,
+    activities whose entity doesn't include it (e.g. 'pulse') are dropped
+    before their data is decoded at all.
+    """
+    for activity in activities:
+        if entity is not None and entity not in activity['entity']:
+            continue
+        activity_data(activity)
+        yield activity
+
+def export_records(records, output_file, summaries=None):
+    """
+    Shared export stage: write the rows to an Excel, csv or Parquet file,
+    depending on the file extension (see export.py), if there's an output_file.
+    With summaries, a function of the DataFrame giving sheets to write instead,
+    e.g. counts alongside the rows. Returns the DataFrame.
+    """
+    import pandas as pd
+    df = pd.DataFrame(records)
+    if output_file is not None:
+        export_frame(df, output_file, summaries)
+    return df
+
+def export_frame(df, output_file, summaries=None):
+    """
+    Write a DataFrame of rows as export_records does. Returns the paths written.
+    """
+    return export(summaries(df) if summaries else df, output_file)
+
+class BoardProfile:
+    """
+    The board-specific stages for one kind of board, along with where its
+    activity is read from and written to by default.
+    """
+
+    def __init__(self, name, data_file, output_file, project, group, aggregate, entity=None, summaries=None):
+        self.name = name
+        self.data_file = data_file
+        self.output_file = output_file
+        self.entity = entity # Only decode activities for this entity, if set
+        self.project = project # Actions from decoded activities
+        self.group = group # Grouped actions from the projected actions
+        self.aggregate = aggregate # Rows from the grouped actions
+        self.summaries = summaries # Sheets to export from the DataFrame of rows, if more than the rows
+
+    def __repr__(self):
+        return f'BoardProfile({self.name!r})'
+
+def project_creative_projects(activities):
+    key_map, my_keys_list = organize_create_projects.map_keys()
+    projection = organize_create_projects.compile_projection(key_map)
+    new_list = organize_create_projects.project_activities(activities, organize_create_projects.units_dict, projection,
+                                                           compact=True)
+    return organize_create_projects.iter_pulses(new_list)
+
+def aggregate_creative_projects(action_index):
+    unique_pulse_ids = organize_create_projects.create_unique_pulse_id_list(action_index)
+    gathered_projects = organize_create_projects.gather_dicts_by_pulse(unique_pulse_ids, action_index)
+    filtered_projects = organize_create_projects.build_filtered_projects(gathered_projects)
+    return organize_create_projects.define_project_types(filtered_projects)
+
+def aggregate_events(grouped):
+    return organize_events.consolidate_events(*grouped)
+
+def aggregate_subitems(grouped):
+    action_dict_list, created_events, archived_events, pulse_ids = grouped
+    return organize_creative_proj_subitems.consolidate_subitems(created_events, archived_events, pulse_ids)
+
+PROFILES = {
+    'creative_projects': BoardProfile(
+        'creative_projects', organize_create_projects.data_file, 'creative_projects.xlsx',
+        project=project_creative_projects, group=ActionIndex, aggregate=aggregate_creative_projects,
+        summaries=organize_create_projects.summary_sheets),
+    'events': BoardProfile(
+        'events', organize_events.data_file, 'event_actions.xlsx', entity='pulse',
+        project=organize_events.iter_pulse_actions, group=organize_events.group_pulse_events,
+        aggregate=aggregate_events),
+    'subitems': BoardProfile(
+        'subitems', organize_creative_proj_subitems.data_file, 'creative_projects_subitems.xlsx',
+        project=organize_creative_proj_subitems.iter_subitem_actions,
+        group=organize_creative_proj_subitems.group_subitem_actions, aggregate=aggregate_subitems),
+    }
+
+def build_grouped(profile, data_file=None):
+    """
+    Run a board's profile through every stage up to and including group,
+    streaming actions from the json file. Returns the grouped actions.
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    activities = ingest_activities(data_file or profile.data_file)
+    activities = iter_stage('decode', decode_activities(activities, profile.entity))
+    actions = iter_stage('project', profile.project(activities))
+    return staged('group', profile.group, actions)
+
+def build_records(profile, data_file=None):
+    """
+    Run a board's profile through every stage up to and including aggregate.
+    Returns the rows.
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    return staged('aggregate', profile.aggregate, build_grouped(profile, data_file))
+
+def run_pipeline(profile, data_file=None, output_file=None):
+    """
+    Run a board's profile through every stage. Returns the DataFrame of rows,
+    which is only written out if there's an output_file.
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    records = build_records(profile, data_file)
+    return staged('export', export_records, records, output_file, profile.summaries)
+
+ROLLUP_OUTPUT_FILE = 'project_effort.xlsx'
+
+def run_project_effort(output_file=None):
+    """
+    Run the creative projects and subitems profiles, and add up each project's
+    subitems onto its row (see subitem_rollup.py). Returns the DataFrame of
+    projects, which is only written out if there's an output_file.
+    """
+    projects = build_records(PROFILES['creative_projects'])
+    action_dict_list = build_grouped(PROFILES['subitems'])[0] # Every subitem action, each with its parent's id
+    records = staged('rollup', rollup_subitems, projects, action_dict_list)
+    return staged('export', export_records, records, output_file, PROFILES['creative_projects'].summaries)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Organize Monday.com activity for one or more boards.')
+    parser.add_argument('boards', nargs='+', choices=sorted(PROFILES) + ['project_effort'],
+                        help='board profiles to run, or project_effort for the creative projects with their subitems added up')
+    parser.add_argument('--data-file', help="merged json file of activity (only with a single board; defaults to the profile's)")
+    parser.add_argument('--output', help="file to write, .xlsx, .csv or .parquet (only with a single board; defaults to the profile's)")
+    parser.add_argument('--report', help='json file to record time, records and memory per stage in (one per board, '
+                                             'named <file>_<board>.json, with more than one board)')
+    parser.add_argument('--profile', help='file to write a cProfile profile to (one per board, like --report)')
+    parser.add_argument('--trace-memory', action='store_true', help='record peak memory per stage in the report too '
+                                                                    '(makes the run a few times slower)')
+    args = parser.parse_args(argv)
+    if len(args.boards) > 1 and (args.data_file or args.output):
+        parser.error('--data-file and --output can only be used with a single board')
+    if 'project_effort' in args.boards and args.data_file:
+        parser.error("--data-file can't be used with project_effort, which reads two boards")
+    for name in args.boards:
+        report_file, profile_file = (_board_file(path, name, len(args.boards)) for path in (args.report, args.profile))
+        output_file = args.output or (ROLLUP_OUTPUT_FILE if name == 'project_effort' else PROFILES[name].output_file)
+        with recording(report_file, profile_file, args.trace_memory, label=name):
+            if name == 'project_effort':
+                df = run_project_effort()
+                summaries = PROFILES['creative_projects'].summaries
+            else:
+                df = run_pipeline(PROFILES[name], args.data_file)
+                summaries = PROFILES[name].summaries
+            paths = staged('export', export_frame, df, output_file, summaries)
+        print(f"{name}: {len(df)} rows written to {', '.join(paths)}")
+        if report_file:
+            print(f'{name}: stage report written to {report_file}')
+
+def _board_file(path, name, n_boards):
+    # The file for one board's report or profile, when there's one for each of several boards
+    if path is None or n_boards == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{name}{ext}'
+
+if __name__ == "__main__":
+    main()
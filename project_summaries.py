@@ -0,0 +1,247 @@
+"""
+Keeps each project's summary up to date as new actions come in. A sync (see
+activity_sync.py) only ever adds a few new actions to the end of a board's
+merged file, yet build_filtered_projects and define_project_types boil every
+project's whole history of actions down again on every run. For each pulse this
+keeps what build_filtered_projects collects from its actions (name, group,
+created date, and the archive dates, deadlines and work types in the order they
+came), along with the finished summary. New actions are added to the pulses they
+belong to, and only those pulses' summaries are worked out again. A pulse
+archived again gets a list of archive dates, and a deadline moved gets a list of
+due dates, just as a full run over the longer file would give.
+
+The summaries are kept in a pickle (so only load files you trust) next to the
+merged file. check_consistency() compares them with a full recompute from the
+actions.
+"""
+
+# Python built-in modules
+import os
+import pickle
+
+# Local modules
+import organize_create_projects as ocp
+from action_index import ActionIndex
+from activity_stream import activity_data
+
+SUMMARY_VERSION = 1 # Bump when what's kept for each pulse changes
+
+
+class ProjectSummaries:
+    """
+    Running per-pulse totals, and the summary define_project_types gives for
+    each pulse, kept up to date one action at a time. Pulses are in the order
+    they first show up, as in ActionIndex.
+    """
+
+    def __init__(self, actions=()):
+        self.pulses = {} # pulse_id: what build_filtered_projects collects from its actions
+        self.summaries = {} # pulse_id: its summary, as define_project_types gives it
+        self.total_actions = 0
+        self.update(actions)
+
+    def add(self, action):
+        """
+        Add one action to its pulse's totals, the way build_filtered_projects
+        reads it. Returns the pulse_id, or None if it isn't a project action.
+        """
+        pulse_id = action.get('pulse_id')
+        if pulse_id is None: # Not a project action, as in iter_pulses
+            return None
+        pulse = self.pulses.get(pulse_id)
+        if pulse is None:
+            pulse = self.pulses[pulse_id] = {'pulse_id': pulse_id, 'total_actions': 0, 'archive_dates': [],
+                                             'deadline_updates': [], 'project_types': []}
+        pulse['total_actions'] += 1
+        for key in ('pulse_name', 'group_id', 'group_name'): # The last one seen wins
+            if key in action:
+                pulse[key] = action[key]
+        values = action.values()
+        if 'create_pulse' in values:
+            pulse['created'] = action['event_date']
+        if 'Type of Work' in values and 'new_text' in action:
+            pulse['project_types'].append(action['new_text'])
+        if 'Internal Due Date' in values and 'new_date' in action: # A removed deadline isn't counted
+            pulse['deadline_updates'].append(action['new_date'])
+        if 'archive_pulse' in values: # Archived again means another archive date
+            pulse['archive_dates'].append(action['event_date'])
+        self.total_actions += 1
+        return pulse_id
+
+    def update(self, actions):
+        """
+        Add new actions (only ones not added before) and work out the summaries
+        of the pulses they touched again. Returns the pulse ids touched.
+        """
+        touched = {}
+        for action in actions:
+            pulse_id = self.add(action)
+            if pulse_id is not None:
+                touched[pulse_id] = None # A dict keeps the order pulses showed up in
+        if touched:
+            projects = [self.filtered_project(pulse_id) for pulse_id in touched]
+            for project in ocp.define_project_types(projects):
+                self.summaries[project['pulse_id']] = project
+        return list(touched)
+
+    def filtered_project(self, pulse_id):
+        """
+        The dict build_filtered_projects gives for a pulse, from its totals.
+        """
+        pulse = self.pulses[pulse_id]
+        project = {'pulse_id': pulse_id, 'total_actions': pulse['total_actions'], 'archive_date': "Not archived"}
+        for key in ('pulse_name', 'group_id', 'group_name', 'created'):
+            if key in pulse:
+                project[key] = pulse[key]
+        project['due_date'] = _one_or_list(pulse['deadline_updates'], "No deadline set")
+        project['archive_date'] = _one_or_list(pulse['archive_dates'], "Not archived")
+        project_types = pulse['project_types']
+        if len(project_types) == 0:
+            project['project_type'] = "undetermined"
+        elif len(project_types) == 1:
+            project['project_type'] = project_types[0]
+        else:
+            project['project_type'] = ocp.flatten(project_types)
+        return project
+
+    def projects(self):
+        """
+        List of the summaries of every pulse, as define_project_types gives them.
+        """
+        return list(self.summaries.values())
+
+    def __len__(self):
+        return len(self.pulses)
+
+    def __contains__(self, pulse_id):
+        return pulse_id in self.pulses
+
+def _one_or_list(values, none):
+    # How build_filtered_projects records dates: a placeholder, the one date, or a copy of the list
+    if len(values) == 0:
+        return none
+    if len(values) == 1:
+        return values[0]
+    return list(values) # define_project_types sorts due dates in place
+
+def _load_saved(summary_file):
+    # What save_summaries wrote, or None if there's nothing (from this version) to load
+    if not os.path.exists(summary_file):
+        return None
+    with open(summary_file, 'rb') as f:
+        saved = pickle.load(f)
+    if saved.get('version') != SUMMARY_VERSION:
+        return None
+    return saved
+
+def load_summaries(summary_file):
+    """
+    The ProjectSummaries saved in summary_file, or None if there aren't any (or
+    they were saved by an older version).
+    """
+    saved = _load_saved(summary_file)
+    return saved['summaries'] if saved is not None else None
+
+def save_summaries(summaries, summary_file, sync=None):
+    """
+    Save the ProjectSummaries, replacing the old file only once the new one is complete.
+    sync marks which sync's new activities they include, see update_summary_file.
+    """
+    temp_file = summary_file + '.tmp'
+    with open(temp_file, 'wb') as f:
+        pickle.dump({'version': SUMMARY_VERSION, 'summaries': summaries, 'sync': sync}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, summary_file)
+
+def project_new_activities(activities, units_dict=ocp.units_dict):
+    """
+    Project raw activities, as a sync fetches them, onto the renamed keys
+    ProjectSummaries reads, leaving out anything that isn't a project action.
+    """
+    key_map, my_keys_list = ocp.map_keys()
+    projection = ocp.compile_projection(key_map)
+    return ocp.iter_pulses(ocp.project_activities(_decoded(activities), units_dict, projection))
+
+def _decoded(activities):
+    for activity in activities:
+        activity_data(activity)
+        yield activity
+
+def update_summary_file(summary_file, new_activities, data_file=None, units_dict=ocp.units_dict, sync=None):
+    """
+    Apply newly fetched activities to the summaries saved in summary_file. If
+    there aren't any saved yet, they're built from all of data_file instead
+    (which should already include the new activities). sync names this batch
+    of activities (activity_sync.py uses the size of the merged file before
+    they were appended); if the saved summaries already include the batch with
+    that name, they're left as they are, so applying a batch again after a
+    sync stopped partway doesn't count it twice. Returns the ProjectSummaries.
+    """
+    saved = _load_saved(summary_file)
+    if saved is not None and sync is not None and saved.get('sync') == sync:
+        return saved['summaries']
+    if saved is None:
+        if data_file is None:
+            raise ValueError(f"No project summaries in {summary_file} to update, and no data_file to build them from")
+        summaries = build_summaries(data_file, units_dict)
+    else:
+        summaries = saved['summaries']
+        summaries.update(project_new_activities(new_activities, units_dict))
+    save_summaries(summaries, summary_file, sync)
+    return summaries
+
+def build_summaries(data_file, units_dict=ocp.units_dict):
+    """
+    ProjectSummaries for every action in a board's merged json file.
+    """
+    key_map, my_keys_list = ocp.map_keys()
+    projection = ocp.compile_projection(key_map)
+    return ProjectSummaries(ocp.iter_pulses(ocp.iter_projected_actions(data_file, units_dict, projection)))
+
+def full_recompute(actions):
+    """
+    The project summaries worked out from scratch, the way organize_create_projects.py does.
+    """
+    gathered_projects = ActionIndex(ocp.iter_pulses(actions)).projects()
+    return ocp.define_project_types(ocp.build_filtered_projects(gathered_projects))
+
+def check_consistency(summaries, actions):
+    """
+    Compare the ProjectSummaries with a full recompute from all of the actions
+    they were built from. Returns a list of (pulse_id, field, kept, recomputed)
+    for every difference, including pulses only one side has; empty if they agree.
+    """
+    recomputed = {project['pulse_id']: project for project in full_recompute(actions)}
+    differences = []
+    for pulse_id in list(dict.fromkeys([*summaries.summaries, *recomputed])):
+        kept = summaries.summaries.get(pulse_id)
+        full = recomputed.get(pulse_id)
+        if kept is None or full is None:
+            differences.append((pulse_id, None, kept, full))
+            continue
+        for field in list(dict.fromkeys([*kept, *full])):
+            if kept.get(field) != full.get(field):
+                differences.append((pulse_id, field, kept.get(field), full.get(field)))
+    if list(summaries.summaries) != list(recomputed):
+        differences.append((None, 'order', list(summaries.summaries), list(recomputed)))
+    return differences
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Build the creative projects summaries, or check saved ones.')
+    parser.add_argument('summary_file', help='pickle the summaries are kept in')
+    parser.add_argument('--data-file', default=ocp.data_file, help="the board's merged json file")
+    parser.add_argument('--check', action='store_true', help='compare the saved summaries with a full recompute')
+    args = parser.parse_args()
+    summaries = load_summaries(args.summary_file)
+    if summaries is None:
+        summaries = build_summaries(args.data_file)
+        save_summaries(summaries, args.summary_file)
+        print(f'{len(summaries)} project summaries written to {args.summary_file}')
+    if args.check:
+        key_map, my_keys_list = ocp.map_keys()
+        actions = ocp.iter_projected_actions(args.data_file, ocp.units_dict, ocp.compile_projection(key_map))
+        differences = check_consistency(summaries, actions)
+        for difference in differences:
+            print('Differs:', *difference)
+        print(f'{len(summaries)} project summaries checked, {len(differences)} differences')
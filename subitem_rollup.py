@@ -0,0 +1,117 @@
+"""
+Adds up each creative project's subitems onto the project's row. Much of the
+work on a project happens in its subitems, which live on their own board and
+get organized into their own file (see organize_creative_proj_subitems.py),
+each with the id of the project it belongs to, and putting the two together
+used to take a VLOOKUP across the two spreadsheets. This does it in one pass
+over the subitem actions, summarizing the subitems by parent id, and one pass
+over the projects, looking each one up:
+
+- subitems: how many subitems the project has
+- subitems_archived: how many of those have been archived
+- subitem_days: the lifespans (days from created to archived) of its archived
+  subitems added up, and subitem_mean_days their average
+- last_subitem_archived: when its last subitem was archived
+
+Projects without subitems get 0 for the counts and nothing for the rest.
+
+It works from every subitem action (action_dict_list from build_lists) rather
+than the consolidated rows, since a row only gets its ids from the subitem's
+create action, while every action carries its parent's id. Subitems created
+before the log starts would otherwise quietly drop out.
+"""
+
+ROLLUP_FIELDS = ['subitems', 'subitems_archived', 'subitem_days', 'subitem_mean_days', 'last_subitem_archived']
+
+
+def subitem_lifespan(subitem):
+    """
+    Days from a subitem's creation to its (last) archiving, or None if it's
+    missing either date.
+    """
+    created = subitem.get('created_date')
+    archived = subitem.get('archive_date')
+    if created is None or archived is None:
+        return None
+    return (archived - created).days
+
+def index_subitems(actions):
+    """
+    Dict of subitem pulse_id to its parent_id, created_date and latest
+    archive_date (each if known), from all of the subitem actions in one pass.
+    """
+    subitems = {}
+    for action in actions:
+        pulse_id = action.get('pulse_id')
+        if pulse_id is None:
+            continue
+        subitem = subitems.get(pulse_id)
+        if subitem is None:
+            subitem = subitems[pulse_id] = {'pulse_id': pulse_id}
+        if action.get('parent_id') is not None:
+            subitem['parent_id'] = action['parent_id']
+        if 'created_date' in action:
+            subitem['created_date'] = action['created_date']
+        if 'archive_date' in action and ('archive_date' not in subitem
+                                         or action['archive_date'] > subitem['archive_date']):
+            subitem['archive_date'] = action['archive_date']
+    return subitems
+
+def index_by_parent(subitems):
+    """
+    Dict of parent id to a summary of that project's subitems (as
+    index_subitems gives them), built in one pass. Subitems without a
+    parent id are left out.
+    """
+    index = {}
+    for subitem in subitems:
+        parent_id = subitem.get('parent_id')
+        if parent_id is None:
+            continue
+        summary = index.get(parent_id)
+        if summary is None:
+            summary = index[parent_id] = {'subitems': 0, 'subitems_archived': 0, 'subitem_days': 0, 'lifespans': 0,
+                                          'last_subitem_archived': None}
+        summary['subitems'] += 1
+        archived = subitem.get('archive_date')
+        if archived is not None:
+            summary['subitems_archived'] += 1
+            if summary['last_subitem_archived'] is None or archived > summary['last_subitem_archived']:
+                summary['last_subitem_archived'] = archived
+        lifespan = subitem_lifespan(subitem)
+        if lifespan is not None:
+            summary['subitem_days'] += lifespan
+            summary['lifespans'] += 1
+    return index
+
+def rollup_subitems(projects, actions):
+    """
+    Add the ROLLUP_FIELDS for each project's subitems to its dict (from
+    build_filtered_projects or define_project_types), matching the subitems
+    in the subitem actions to projects by parent id and pulse_id. Returns the
+    projects.
+    """
+    index = index_by_parent(index_subitems(actions).values())
+    for project in projects:
+        summary = index.get(project['pulse_id'])
+        if summary is None:
+            project['subitems'] = 0
+            project['subitems_archived'] = 0
+            continue
+        project['subitems'] = summary['subitems']
+        project['subitems_archived'] = summary['subitems_archived']
+        if summary['lifespans']:
+            project['subitem_days'] = summary['subitem_days']
+            project['subitem_mean_days'] = round(summary['subitem_days'] / summary['lifespans'], 1)
+        if summary['last_subitem_archived'] is not None:
+            project['last_subitem_archived'] = summary['last_subitem_archived']
+    return projects
+
+def orphan_subitems(projects, actions):
+    """
+    The subitems (as index_subitems gives them) whose parent isn't among the
+    projects, e.g. because the project's activity falls outside the dates of
+    the projects file, or that have no parent id at all.
+    """
+    pulse_ids = {project['pulse_id'] for project in projects}
+    return [subitem for subitem in index_subitems(actions).values() if subitem.get('parent_id') not in pulse_ids]
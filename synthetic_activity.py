@@ -0,0 +1,248 @@
+"""
+Makes up activity logs shaped exactly like our merged json files, at any
+scale, for benchmarking the organizer scripts and trying out changes, since
+the real files are private. Each activity has the same envelope Monday.com
+returns (id, event, entity, user_id, created_at in 1e-7 second units as a
+string, and data as a json string), newest first.
+
+Activity is made up a pulse at a time, following its life on the board: it's
+created, gets subscribers and an owner, has its type of work, due date and
+status set (and often changed), is sometimes renamed or moved to another group,
+and is usually archived, now and then restored and archived again. Pulses on
+the subitems board are subitems of pulses on the projects board, with the same
+seed giving the same parent pulse ids, so the two files can be joined.
+
+The same seed always gives the same activity. Write a file from the command
+line, e.g.:
+
+    python synthetic_activity.py projects 100000 synthetic_projects.json --seed 1
+"""
+
+# Python built-in modules
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import random
+import uuid
+
+# Local modules
+from group_names import STATIC_GROUPS
+
+# Monday.com's timestamps are unix time in 1e-7 second units
+TICKS_PER_DAY = 86400 * 10000000
+DEFAULT_END = 16962733871271076 # 2023-10-02, about when our merged files end
+
+# Board id, groups (id to title) and first pulse id for each kind of board
+BOARDS = {
+    'projects': {'board_id': 592284362, 'groups': STATIC_GROUPS[592284362], 'first_pulse_id': 3000000000},
+    'events': {'board_id': 736608574, 'first_pulse_id': 3500000000,
+               'groups': {'new_group': 'Upcoming Events', 'topics': 'Event Photography', 'new_group4351': 'Past Events'}},
+    'subitems': {'board_id': 2443727631, 'groups': {'topics': 'Subitems'}, 'first_pulse_id': 4000000000,
+                 'parent_board': 'projects'},
+    }
+USER_IDS = ['14424764', '21536253', '23540333', '23562546', '25055136', '36207653', '39183419']
+WORK_TYPES = ['Editorial', 'Email', 'Email Marketing', 'Event Promotion', 'Graphic Design', 'News & Pubs',
+              'Photography', 'Print Production', 'Social Media Marketing', 'Staff', 'Videography', 'Web (People)', 'Web']
+STATUSES = [('Working on it', False), ('Waiting on Content', False), ('Designing', False), ('Stuck', False),
+            ('Done', True)]
+
+
+def _data_string(data):
+    # Monday.com's data level is compact json, with no spaces
+    return json.dumps(data, separators=(',', ':'))
+
+def _changed_at(created_at):
+    # The ISO timestamp Monday.com puts in a column value
+    moment = datetime.datetime.fromtimestamp(created_at / 10000000, datetime.timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f'{moment.microsecond // 1000:03d}Z'
+
+class _Pulse:
+    # What's needed to write the data level of a pulse's actions
+    def __init__(self, board, pulse_id, name, group_id, parent_item_id=None):
+        self.board = board
+        self.pulse_id = pulse_id
+        self.name = name
+        self.group_id = group_id
+        self.parent_item_id = parent_item_id
+
+    def base(self):
+        return {'board_id': self.board['board_id'], 'group_id': self.group_id, 'is_top_group': self.group_id == 'topics',
+                'pulse_id': self.pulse_id, 'pulse_name': self.name}
+
+    def with_parent(self, data):
+        if self.parent_item_id is not None:
+            data['parent_board_id'] = BOARDS[self.board['parent_board']]['board_id']
+            data['parent_item_id'] = self.parent_item_id
+        return data
+
+def _label(status):
+    # A status column's label, from one of STATUSES
+    return {'index': STATUSES.index(status), 'text': status[0], 'style': {}, 'is_done': status[1]}
+
+def _column_update(pulse, column_id, column_type, column_title, value, previous_value, text=None,
+                   previous_text=None):
+    data = pulse.base()
+    data.update({'column_id': column_id, 'column_type': column_type, 'column_title': column_title, 'value': value,
+                 'previous_value': previous_value, 'is_column_with_hide_permissions': False})
+    pulse.with_parent(data)
+    if text is not None:
+        data['textual_value'] = text
+    if previous_text is not None:
+        data['previous_textual_value'] = previous_text
+    return 'update_column_value', data
+
+def _pulse_actions(rng, pulse, created, last, archived, n_actions):
+    """
+    (created_at, event, data) for each action in a pulse's life, oldest first:
+    created at created, with its last action (its archiving, if archived) at
+    last, both in ticks.
+    """
+    actions = []
+    base = pulse.with_parent(pulse.base())
+    base.update({'group_name': pulse.board['groups'][pulse.group_id], 'group_color': '#579bfc',
+                 'column_values_json': '{}'})
+    actions.append((created, 'create_pulse', base))
+    owner = int(rng.choice(USER_IDS))
+    for event in ['subscribe', 'add_owner']:
+        actions.append((created + rng.randrange(1, 10000000), event,
+                        {'item_id': pulse.pulse_id, 'item_name': pulse.name, 'item_type': 'Project',
+                         'subscribed_id': owner, 'board_id': pulse.board['board_id'], 'pulse_id': pulse.pulse_id}))
+    archive_actions = 0 if not archived else (3 if rng.random() < 0.05 else 1) # Sometimes restored and archived again
+    n_updates = max(0, n_actions - len(actions) - archive_actions)
+    work_type = None
+    due_date = None
+    status = None
+    for at in sorted(rng.randrange(created + 10000000, last) for _ in range(n_updates)):
+        kind = rng.random()
+        if kind < 0.15: # Type of work, sometimes more than one
+            previous = work_type
+            work_type = ', '.join(rng.sample(WORK_TYPES, 2 if rng.random() < 0.2 else 1))
+            event, data = _column_update(
+                pulse, 'dropdown', 'dropdown', 'Type of Work',
+                {'chosenValues': [{'id': WORK_TYPES.index(name), 'name': name} for name in work_type.split(', ')]},
+                None, text=work_type, previous_text=previous)
+        elif kind < 0.35: # Due date, set, changed or (now and then) removed
+            previous = due_date
+            day = at + rng.randrange(-10, 60) * TICKS_PER_DAY
+            due_date = None if due_date and rng.random() < 0.1 else _changed_at(day)[:10]
+            value = None if due_date is None else {'date': due_date, 'icon': None, 'time': None,
+                                                   'changed_at': _changed_at(at)}
+            previous_value = None if previous is None else {'date': previous, 'icon': None, 'time': None}
+            event, data = _column_update(pulse, 'date4', 'date', 'Internal Due Date', value, previous_value)
+        elif kind < 0.75: # Status
+            previous = status
+            status = rng.choice(STATUSES)
+            event, data = _column_update(pulse, 'status', 'color', 'Status', {'label': _label(status), 'post_id': None},
+                                         None if previous is None else {'label': _label(previous)},
+                                         text=status[0], previous_text=None if previous is None else previous[0])
+        elif kind < 0.9: # Owners
+            people = [{'id': int(user_id), 'kind': 'person'} for user_id in rng.sample(USER_IDS, rng.randrange(1, 4))]
+            event, data = _column_update(pulse, 'people', 'multiple-person', 'Owner(s)',
+                                         {'personsAndTeams': people, 'changed_at': _changed_at(at)}, None)
+        elif kind < 0.95: # Renamed
+            previous = pulse.name
+            pulse.name = f'{previous} (rev)' if not previous.endswith('(rev)') else previous[:-6]
+            event = 'update_name'
+            data = {'board_id': pulse.board['board_id'], 'group_id': pulse.group_id, 'pulse_id': pulse.pulse_id,
+                    'is_top_group': pulse.group_id == 'topics', 'value': {'name': pulse.name},
+                    'previous_value': {'name': previous}, 'column_type': 'name', 'column_title': 'Name'}
+        else: # Moved to another group
+            groups = pulse.board['groups']
+            source = pulse.group_id
+            pulse.group_id = rng.choice(list(groups))
+            event = 'move_pulse_into_group'
+            data = {'board_id': pulse.board['board_id'], 'group_id': pulse.group_id,
+                    'source_board': {'id': pulse.board['board_id'], 'name': 'Synthetic', 'kind': 'public'},
+                    'source_group': {'id': source, 'title': groups[source], 'color': '#579bfc',
+                                     'is_top_group': source == 'topics'},
+                    'dest_group': {'id': pulse.group_id, 'title': groups[pulse.group_id], 'color': '#579bfc',
+                                   'is_top_group': pulse.group_id == 'topics'},
+                    'pulse': {'id': pulse.pulse_id, 'name': pulse.name}, 'action_record_id': None,
+                    'is_undo_action': False, 'is_batch_action': False}
+        actions.append((at, event, data))
+    if archived:
+        archive = pulse.with_parent({'board_id': pulse.board['board_id'], 'pulse_id': pulse.pulse_id,
+                                     'pulse_name': pulse.name, 'value': {}, 'previous_value': {}})
+        if archive_actions == 3:
+            first = rng.randrange(created + 1, last)
+            restored = rng.randrange(first, last)
+            actions.append((first, 'archive_pulse', dict(archive)))
+            actions.append((restored, 'restore_pulse', pulse.with_parent(
+                {'board_id': pulse.board['board_id'], 'pulse_id': pulse.pulse_id, 'pulse_name': pulse.name,
+                 'value': {'state': 1, 'is_undo': False}, 'previous_value': {'state': 2}})))
+        actions.append((last, 'archive_pulse', archive))
+    actions.sort(key=lambda action: action[0])
+    return actions
+
+def iter_synthetic_activities(n_actions, board='projects', seed=0, actions_per_pulse=15, end=DEFAULT_END,
+                              days_between_pulses=0.5, archive_rate=0.7, subitems_per_parent=3):
+    """
+    Stream n_actions made-up activities for a board in BOARDS, newest first, in
+    Monday.com's envelope. Pulse i (counting back from the newest) ends about
+    days_between_pulses * i days before end; the log starts partway into the
+    life of the oldest pulses, as a real export does. Subitem pulse i belongs
+    to project pulse i // subitems_per_parent.
+    """
+    rng = random.Random(f'{board}-{seed}')
+    board = BOARDS[board] if isinstance(board, str) else board
+    groups = list(board['groups'])
+    spacing = int(days_between_pulses * TICKS_PER_DAY)
+    heap = [] # (-created_at, tiebreak, event, data) for actions not yet emitted
+    tiebreak = itertools.count()
+    emitted = 0
+    i = 0
+    while emitted < n_actions:
+        last = end - i * spacing
+        # Every action still to come is older than this pulse's last one
+        while heap and -heap[0][0] > last and emitted < n_actions:
+            yield _activity(rng, *heapq.heappop(heap))
+            emitted += 1
+        if emitted >= n_actions:
+            break
+        parent_item_id = None
+        if 'parent_board' in board:
+            parent_item_id = BOARDS[board['parent_board']]['first_pulse_id'] + i // subitems_per_parent
+        pulse_id = board['first_pulse_id'] + i
+        pulse = _Pulse(board, pulse_id, f'Synthetic pulse {pulse_id}', rng.choice(groups), parent_item_id)
+        lifespan = rng.randrange(1, 180) * TICKS_PER_DAY + rng.randrange(TICKS_PER_DAY)
+        archived = rng.random() < archive_rate
+        n_pulse_actions = max(3, int(rng.expovariate(1 / actions_per_pulse)))
+        for created_at, event, data in _pulse_actions(rng, pulse, last - lifespan, last, archived, n_pulse_actions):
+            heapq.heappush(heap, (-created_at, next(tiebreak), event, data))
+        i += 1
+
+def _activity(rng, negative_created_at, tiebreak, event, data):
+    return {'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)), 'event': event, 'data': _data_string(data),
+            'entity': 'pulse', 'user_id': rng.choice(USER_IDS), 'created_at': str(-negative_created_at)}
+
+def write_activity_file(path, activities):
+    """
+    Write a stream of activities to a json file like our merged files, one at a
+    time. Returns the number written.
+    """
+    written = 0
+    with open(path, 'w') as f:
+        f.write('[')
+        for activity in activities:
+            f.write((', ' if written else '') + json.dumps(activity))
+            written += 1
+        f.write(']')
+    return written
+
+def write_synthetic_file(path, n_actions, board='projects', seed=0, **options):
+    """
+    Write n_actions made-up activities for a board to a json file.
+    """
+    return write_activity_file(path, iter_synthetic_activities(n_actions, board, seed, **options))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a json file of made-up Monday.com activity.')
+    parser.add_argument('board', choices=sorted(BOARDS))
+    parser.add_argument('n_actions', type=int)
+    parser.add_argument('output', help='json file to write')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    written = write_synthetic_file(args.output, args.n_actions, args.board, args.seed)
+    print(f'{written} activities written to {args.output}')
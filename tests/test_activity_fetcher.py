@@ -0,0 +1,146 @@
+import asyncio
+import calendar
+import datetime
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from activity_fetcher import DATE_FORMAT, ActivityFetcher, _merge_unique, _retry_delay, split_window
+from monday_client import MondayAPIError
+
+BOARD_ID = 736608574
+FROM_DATE = '2023-01-01T00:00:00Z'
+TO_DATE = '2023-01-01T00:00:20Z'
+_QUERY = re.compile(r'ids: (\d+)\) \{ activity_logs \(from: "([^"]+)", to: "([^"]+)", limit:(\d+)\)')
+
+
+def _second(date):
+    return calendar.timegm(datetime.datetime.strptime(date, DATE_FORMAT).timetuple())
+
+def _activity(activity_id, second, tick=0):
+    return {'id': activity_id, 'event': 'update_column_value', 'data': '{}', 'entity': 'pulse', 'user_id': '1',
+            'created_at': str(second * 10000000 + tick)}
+
+class StubMonday:
+    """
+    A local stand-in for the Monday.com API: answers activity_logs queries from
+    a list of activities (newest first, both ends of the window included, down
+    to the second, at most limit of them), after first sending any canned
+    (status, headers, body) responses queued up in responses.
+    """
+
+    def __init__(self, activities):
+        self.activities = sorted(activities, key=lambda activity: int(activity['created_at']), reverse=True)
+        self.responses = []
+        self.windows = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                query = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['query']
+                if stub.responses:
+                    status, headers, body = stub.responses.pop(0)
+                else:
+                    status, headers, body = 200, {}, stub.answer(query)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                payload = json.dumps(body).encode()
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def answer(self, query):
+        board_id, from_date, to_date, limit = _QUERY.search(query).groups()
+        self.windows.append((from_date, to_date))
+        start, end = _second(from_date), _second(to_date)
+        logs = [activity for activity in self.activities if start <= int(activity['created_at']) // 10000000 <= end]
+        return {'data': {'boards': [{'activity_logs': logs[:int(limit)]}]}}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _fetch(stub, **options):
+    fetcher = ActivityFetcher(api_key='test', api_url=stub.url, base_delay=0, **options)
+    activities = asyncio.run(fetcher.fetch_boards([BOARD_ID], [(FROM_DATE, TO_DATE)]))[BOARD_ID]
+    fetcher.client.close()
+    return fetcher, activities
+
+
+def test_split_window_shares_the_middle_second():
+    left, right = split_window(FROM_DATE, TO_DATE)
+    assert left == (FROM_DATE, '2023-01-01T00:00:10Z')
+    assert right == ('2023-01-01T00:00:10Z', TO_DATE)
+    assert split_window(FROM_DATE, '2023-01-01T00:00:01Z') is None
+
+def test_merge_unique_drops_repeated_ids():
+    first = [_activity('a', 1), _activity('b', 2)]
+    second = [_activity('b', 2), _activity('c', 3)]
+    assert [activity['id'] for activity in _merge_unique(first, second)] == ['a', 'b', 'c']
+
+def test_full_window_is_split_until_everything_fits():
+    start = _second(FROM_DATE)
+    activities = [_activity(f'a{i}', start + i) for i in range(21)] # One a second, both ends included
+    with StubMonday(activities) as stub:
+        fetcher, fetched = _fetch(stub, limit=10)
+    assert fetcher.windows_split > 0
+    assert sorted(activity['id'] for activity in fetched) == sorted(activity['id'] for activity in activities)
+
+def test_middle_second_comes_back_once():
+    start = _second(FROM_DATE)
+    middle = [_activity(f'm{i}', start + 10, tick=i) for i in range(4)] # In both halves of the split
+    others = [_activity(f'a{i}', start + i) for i in range(21) if i != 10]
+    with StubMonday(middle + others) as stub:
+        fetcher, fetched = _fetch(stub, limit=10)
+    assert ('2023-01-01T00:00:10Z', TO_DATE) in stub.windows # Both halves asked for the middle second
+    assert (FROM_DATE, '2023-01-01T00:00:10Z') in stub.windows
+    ids = [activity['id'] for activity in fetched]
+    assert len(ids) == len(set(ids)) == 24
+
+@pytest.mark.parametrize('response', [
+    (429, {'Retry-After': '0'}, {'error_message': 'Rate limit exceeded'}),
+    (200, {}, {'errors': [{'message': 'Complexity budget exhausted',
+                           'extensions': {'code': 'COMPLEXITY_BUDGET_EXHAUSTED', 'retry_in_seconds': 0}}]}),
+    (200, {}, {'error_code': 'ComplexityException', 'error_message': 'Complexity budget exhausted, reset in 0 seconds'}),
+    ])
+def test_retries_after_rate_limit(response):
+    activities = [_activity('a', _second(FROM_DATE) + 1)]
+    with StubMonday(activities) as stub:
+        stub.responses.append(response)
+        fetcher, fetched = _fetch(stub)
+    assert fetcher.requests_made == 2
+    assert [activity['id'] for activity in fetched] == ['a']
+
+def test_other_errors_are_not_retried():
+    with StubMonday([]) as stub:
+        stub.responses.append((200, {}, {'errors': [{'message': 'Field "nope" doesn\'t exist'}]}))
+        with pytest.raises(MondayAPIError, match='Found an error'):
+            _fetch(stub)
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def test_retry_delay_backs_off_exponentially():
+    for attempt in range(4):
+        delay = _retry_delay(_Response(429), None, attempt, base_delay=1.0)
+        assert 2 ** attempt <= delay < 2 ** (attempt + 1)
+    assert _retry_delay(_Response(429, {'Retry-After': '7'}), None, 0, base_delay=1.0) == 7
+    assert _retry_delay(_Response(200), {'data': {}}, 0, base_delay=1.0) is None
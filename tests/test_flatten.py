@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+import organize_create_projects as ocp
+
+# Shapes flatten_dict has to treat the way json_normalize does
+RECORDS = [
+    {'id': '1', 'event': 'create_pulse', 'data': {}}, # Empty nested dict
+    {'id': '2', 'data': {'value': None, 'previous_value': {'date': None}}}, # None values
+    {'id': '3', 'data': {'value': {'personsAndTeams': [{'id': 5, 'kind': 'person'}]}, 'tags': [1, 2]}}, # Lists
+    {'id': '4', 'data': {'x': {'y': {}}, 'z': 1.5, 'w': True}}, # Empty dict further down
+    {'id': '5', 'a.b': 1, 'a': {'b': 2}}, # Key collisions, either way round
+    {'id': '6', 'a': {'b': 2}, 'a.b': 1},
+    {'id': '7', 'user_id': '123', 'data': {'pulse_id': 1000000001, 'value': {'label': {'text': 'Done', 'style': {}}}}},
+    ]
+
+
+def _json_normalize(record):
+    return pd.json_normalize(record, sep='.').to_dict(orient='records')[0]
+
+def _typed(record):
+    return [(key, type(value), value) for key, value in record.items()]
+
+@pytest.mark.parametrize('record', RECORDS)
+def test_flatten_dict_matches_json_normalize(record):
+    # Same keys, values and key order
+    assert _typed(ocp.flatten_dict(record)) == _typed(_json_normalize(record))
+
+def test_flatten_dicts_batch_matches_json_normalize():
+    # Batch mode drops the keys whose value is None
+    expected = [{key: value for key, value in _json_normalize(record).items() if value is not None} for record in RECORDS]
+    batch = ocp.flatten_dicts(RECORDS, batch=True)
+    assert [sorted(_typed(record)) for record in batch] == [sorted(_typed(record)) for record in expected]
+
+def test_flatten_dicts_matches_flatten_dict():
+    assert ocp.flatten_dicts(RECORDS) == [ocp.flatten_dict(record) for record in RECORDS]
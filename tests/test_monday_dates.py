@@ -0,0 +1,28 @@
+import datetime
+
+import pytest
+
+from monday_dates import string_to_date, strings_to_dates
+
+
+def test_strings_to_dates_matches_string_to_date():
+    values = ['2023-03-01', '2023-03-01T17:18:57.640Z', '2021-12-31', '2024-02-29T00:00:00Z']
+    assert strings_to_dates(values) == [string_to_date(value) for value in values]
+    assert strings_to_dates(values)[1] == datetime.date(2023, 3, 1)
+
+def test_strings_to_dates_empty():
+    assert strings_to_dates([]) == []
+
+@pytest.mark.parametrize('value', ['2023-03-01xyz', '2023-03-01 ', '2023-03', '2023', '', 'NaT', 'nat', '20230301',
+                                   '2023-02-30', '2023-03-01T'])
+def test_strings_to_dates_rejects_what_string_to_date_rejects(value):
+    with pytest.raises(ValueError):
+        string_to_date(value)
+    with pytest.raises(ValueError):
+        strings_to_dates([value])
+    with pytest.raises(ValueError):
+        strings_to_dates(['2023-03-01', value])
+
+def test_strings_to_dates_falls_back_for_unpadded_dates():
+    # strptime reads these, NumPy doesn't
+    assert strings_to_dates(['2023-3-1', '2023-03-02']) == [datetime.date(2023, 3, 1), datetime.date(2023, 3, 2)]